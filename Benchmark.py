@@ -0,0 +1,321 @@
+# Benchmark harness for TileSlidingPuzzleSolver.py
+# Runs each searching algorithm over the reference puzzles (and any extra puzzle files), records wall time,
+# nodes expanded, nodes per second and peak memory, checks solution lengths against the reference solutions
+# and compares the results with a saved baseline to catch regressions. Families of random puzzles at increasing
+# board heights and solution depths can be generated with PuzzleGenerator.py and benchmarked alongside.
+
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+#====================================================================================
+
+SOLVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "TileSlidingPuzzleSolver.py")
+REFERENCE_PUZZLES = ["easy1.txt", "med1.txt", "hard1.txt"]
+ALGOS = ['astar', 'wastar', 'greedy', 'dfs', 'external']
+OPTIMAL_ALGOS = ['external'] # Algorithms whose solutions must match the reference length
+# A* is not guaranteed to be optimal (its heuristic can overestimate), but it reproduces the reference
+# lengths today, so a different length from it is reported as a regression rather than as not optimal
+REGRESSION_ALGOS = ['astar']
+
+def count_moves(filename):
+    """
+    Returns the number of moves in a solution file written in the full board format.
+
+    :param filename: The name of the solution file.
+    :type filename: str
+    :return: The number of moves, or None if the file says there is no solution (or none was found within budget).
+    :rtype: int or None
+    """
+    boards = 0
+    in_board = False
+    with open(filename, "r") as solution_file:
+        for line in solution_file:
+            if line.strip() in ("No solution", "No solution found within budget"):
+                return None
+            if line.strip():
+                if not in_board:
+                    boards += 1
+                in_board = True
+            else:
+                in_board = False
+    return boards - 1
+
+def reference_solution(puzzle):
+    """
+    Returns the reference solution file shipped next to a puzzle file (e.g. med1.txt -> med1sol.txt), if any.
+
+    :param puzzle: The name of the puzzle file.
+    :type puzzle: str
+    :rtype: str or None
+    """
+    root, ext = os.path.splitext(puzzle)
+    candidate = root + "sol" + ext
+    return candidate if os.path.exists(candidate) else None
+
+def run_case(puzzle, algo, timeout, extra_args=()):
+    """
+    Solves one puzzle file with one algorithm in a fresh solver process.
+    Running each case in its own process keeps the peak memory of one case
+    from hiding that of the next.
+
+    :param puzzle: The name of the puzzle file.
+    :type puzzle: str
+    :param algo: The searching algorithm.
+    :type algo: str
+    :param timeout: Seconds after which the case is abandoned.
+    :type timeout: float
+    :param extra_args: Further command line arguments for the solver.
+    :type extra_args: Sequence[str]
+    :return: The measurements for the case.
+    :rtype: dict
+    """
+    result = {"puzzle": puzzle, "algo": algo}
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, "solution.txt")
+        stats_file = os.path.join(workdir, "stats.json")
+        command = [sys.executable, SOLVER, "--inputfile", puzzle, "--outputfile", output,
+                   "--algo", algo, "--stats", stats_file] + list(extra_args)
+        start = time.perf_counter()
+        try:
+            completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            result["status"] = "timeout"
+            return result
+        result["wall_time"] = time.perf_counter() - start
+        if completed.returncode != 0:
+            result["status"] = "error"
+            result["error"] = completed.stderr.strip().splitlines()[-1:]
+            return result
+        with open(stats_file, "r") as report_file:
+            report = json.load(report_file)
+    puzzles = report["puzzles"]
+    result["status"] = "ok"
+    result["expanded"] = sum(stats["expanded"] for stats in puzzles)
+    result["generated"] = sum(stats["generated"] for stats in puzzles)
+    search_time = sum(stats["phases"].get("search", 0.0) for stats in puzzles)
+    result["nodes_per_sec"] = result["expanded"] / search_time if search_time > 0 else None
+    result["peak_rss_kb"] = report["peak_rss_kb"]
+    result["solution_length"] = [stats["solution_length"] for stats in puzzles]
+    return result
+
+def check_reference(result):
+    """
+    Compares the solution length of a case with the reference solution of its puzzle, if there is one.
+    Algorithms in OPTIMAL_ALGOS must match it, and algorithms in REGRESSION_ALGOS are checked against it as a
+    regression check; the others may find longer paths.
+
+    :param result: The measurements for the case, updated in place with "reference_length" and either an
+        "optimal" or a "matches_reference" entry.
+    :type result: dict
+    """
+    reference = reference_solution(result["puzzle"])
+    if reference is None or result["status"] != "ok":
+        return
+    expected = count_moves(reference)
+    result["reference_length"] = expected
+    if result["algo"] in OPTIMAL_ALGOS:
+        result["optimal"] = result["solution_length"] == [expected]
+    elif result["algo"] in REGRESSION_ALGOS:
+        result["matches_reference"] = result["solution_length"] == [expected]
+
+def case_key(result):
+    return "{}:{}".format(result["algo"], os.path.basename(result["puzzle"]))
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Finds the cases that got worse compared with a baseline run.
+    A case regresses when it no longer finishes, finds a different solution
+    length, expands more nodes, or takes more than (1 + tolerance) times the
+    baseline wall time.
+
+    :param results: The measurements of this run.
+    :type results: list[dict]
+    :param baseline: The measurements of the baseline run.
+    :type baseline: list[dict]
+    :param tolerance: The allowed relative slowdown in wall time.
+    :type tolerance: float
+    :return: A list of human readable regression descriptions.
+    :rtype: list[str]
+    """
+    previous = {case_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(case_key(result))
+        if before is None or before["status"] != "ok":
+            continue
+        name = case_key(result)
+        if result["status"] != "ok":
+            regressions.append("{}: {} (was ok)".format(name, result["status"]))
+            continue
+        if result["solution_length"] != before["solution_length"]:
+            regressions.append("{}: solution length {} (was {})".format(
+                name, result["solution_length"], before["solution_length"]))
+        if result["expanded"] > before["expanded"]:
+            regressions.append("{}: {} nodes expanded (was {})".format(name, result["expanded"], before["expanded"]))
+        if result["wall_time"] > before["wall_time"] * (1 + tolerance):
+            regressions.append("{}: {:.2f}s (was {:.2f}s)".format(name, result["wall_time"], before["wall_time"]))
+    return regressions
+
+def generate_families(directory, heights, depths, count, seed):
+    """
+    Writes one multi-puzzle file of random puzzles for every (height, depth) pair.
+
+    :param directory: The directory to write the files to.
+    :type directory: str
+    :param heights: The board heights.
+    :type heights: list[int]
+    :param depths: The lengths of the random walks from initial to goal boards.
+    :type depths: list[int]
+    :param count: The number of puzzles per file.
+    :type count: int
+    :param seed: The random seed, so that the same corpus is generated on every run.
+    :type seed: int
+    :return: The names of the files written.
+    :rtype: list[str]
+    """
+    import PuzzleGenerator # Imported here as it pulls in the solver and its dependencies
+    rng = random.Random(seed)
+    filenames = []
+    for height in heights:
+        for depth in depths:
+            filename = os.path.join(directory, "gen_h{}_d{}.txt".format(height, depth))
+            PuzzleGenerator.write_corpus(filename, height, PuzzleGenerator.default_inventory(height), depth, count, rng)
+            filenames.append(filename)
+    return filenames
+
+def format_result(result):
+    if result["status"] != "ok":
+        return "{:<30} {:<8} {}".format(os.path.basename(result["puzzle"]), result["algo"], result["status"])
+    nodes_per_sec = result["nodes_per_sec"] or 0
+    if "matches_reference" in result:
+        optimal = {True: "ref", False: "DIFF"}[result["matches_reference"]]
+    else:
+        optimal = {True: "yes", False: "NO"}.get(result.get("optimal"), "-")
+    return "{:<30} {:<8} {:>9.2f}s {:>10} {:>10.0f}/s {:>9}KB {:>8} {:>7}".format(
+        os.path.basename(result["puzzle"]), result["algo"], result["wall_time"], result["expanded"],
+        nodes_per_sec, result["peak_rss_kb"] or 0, ",".join(str(length) for length in result["solution_length"]),
+        optimal)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--algos",
+        nargs="+",
+        default=ALGOS,
+        choices=ALGOS,
+        help="The searching algorithms to benchmark."
+    )
+    parser.add_argument(
+        "--weight",
+        type=float,
+        help="The heuristic weight passed to the solver for weighted A*."
+    )
+    parser.add_argument(
+        "--puzzles",
+        nargs="+",
+        default=REFERENCE_PUZZLES,
+        help="The reference puzzle files to run (solutions are checked against <name>sol.txt when present)."
+    )
+    parser.add_argument(
+        "--corpus",
+        nargs="*",
+        default=[],
+        help="Glob patterns of further puzzle files to run, e.g. 'corpus/*.txt'."
+    )
+    parser.add_argument(
+        "--generate-heights",
+        nargs="*",
+        type=int,
+        default=[],
+        help="Also benchmark generated puzzles at these board heights, e.g. 5 6 7."
+    )
+    parser.add_argument(
+        "--generate-depths",
+        nargs="+",
+        type=int,
+        default=[10, 20, 40],
+        help="The random walk lengths of the generated puzzles."
+    )
+    parser.add_argument(
+        "--generate-count",
+        type=int,
+        default=3,
+        help="The number of generated puzzles per (height, depth) pair."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="The random seed for the generated puzzles."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=600,
+        help="Seconds after which a single case is abandoned."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        help="A results file from an earlier run to compare against; exits with status 1 on regressions."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="The relative slowdown in wall time allowed before a case counts as a regression."
+    )
+    parser.add_argument(
+        "--save",
+        type=str,
+        help="Write the results of this run to a file, to be used later as a baseline."
+    )
+    args = parser.parse_args()
+
+    puzzles = list(args.puzzles)
+    for pattern in args.corpus:
+        puzzles += sorted(glob.glob(pattern))
+    corpus_dir = tempfile.TemporaryDirectory()
+    if args.generate_heights:
+        puzzles += generate_families(corpus_dir.name, args.generate_heights, args.generate_depths,
+                                     args.generate_count, args.seed)
+
+    print("{:<30} {:<8} {:>10} {:>10} {:>12} {:>11} {:>8} {:>7}".format(
+        "puzzle", "algo", "wall", "expanded", "nodes/sec", "peak RSS", "moves", "optimal"))
+    results = []
+    for puzzle in puzzles:
+        for algo in args.algos:
+            extra_args = ["--weight", str(args.weight)] if algo == "wastar" and args.weight is not None else []
+            result = run_case(puzzle, algo, args.timeout, extra_args)
+            check_reference(result)
+            results.append(result)
+            print(format_result(result))
+            sys.stdout.flush()
+
+    corpus_dir.cleanup()
+
+    if args.save:
+        with open(args.save, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+
+    failures = ["{}: solution length {} (reference {})".format(
+        case_key(result), result["solution_length"], result["reference_length"])
+        for result in results if result.get("optimal") is False]
+    failures += ["{}: solution length {} differs from the reference {} (regression check, not optimality)".format(
+        case_key(result), result["solution_length"], result["reference_length"])
+        for result in results if result.get("matches_reference") is False]
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            failures += compare_with_baseline(results, json.load(baseline_file), args.tolerance)
+    for failure in failures:
+        print("REGRESSION " + failure)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,238 @@
+# Random puzzle generator for TileSlidingPuzzleSolver.py
+# Places a given inventory of pieces at random on a board of any height, then creates the goal board with a
+# random walk of legal moves (made with slide_piece), so every generated puzzle is solvable in at most the
+# requested number of moves. Puzzles are written in the input format read by read_from_file.
+
+import argparse
+import random
+from contextlib import redirect_stdout
+
+from TileSlidingPuzzleSolver import Board, Piece, check_invariants, pack_board, slide_piece
+
+#====================================================================================
+
+# Cells covered by each piece type relative to its top left corner, in the order of piece_inventory
+PIECE_SHAPES = [
+    ("two_by_two", [(0, 0), (1, 0), (0, 1), (1, 1)]),
+    ("single", [(0, 0)]),
+    ("h", [(0, 0), (1, 0)]),
+    ("v", [(0, 0), (0, 1)]),
+]
+
+def default_inventory(height, width=4):
+    """
+    Returns a Hua Rong Dao style inventory for a board of the given size:
+    one 2x2 piece, one horizontal piece, four vertical pieces, two empty cells
+    and 1x1 pieces filling the rest. A 4x5 board gives the classic puzzle.
+
+    :param height: The height of the board.
+    :type height: int
+    :param width: The width of the board.
+    :type width: int
+    :return: The number of 2x2, 1x1, horizontal and vertical pieces.
+    :rtype: tuple[int, int, int, int]
+    """
+    if width < 2 or height < 2 or width * height < 16:
+        raise ValueError("the default inventory needs a board of at least 16 cells")
+    return (1, width * height - 16, 1, 4)
+
+def random_board(height, inventory, rng, width=4, attempts=1000):
+    """
+    Places the pieces of an inventory at random positions on an empty board.
+    Larger pieces are placed first; if a placement gets stuck the board is
+    started again.
+
+    :param height: The height of the board.
+    :type height: int
+    :param inventory: The number of 2x2, 1x1, horizontal and vertical pieces.
+    :type inventory: tuple[int, int, int, int]
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :param width: The width of the board.
+    :type width: int
+    :param attempts: How many times to start again before giving up.
+    :type attempts: int
+    :return: A board holding exactly the given pieces.
+    :rtype: Board
+    :raises ValueError: If the pieces do not fit on the board.
+    """
+    counts = dict(zip([name for name, _ in PIECE_SHAPES], inventory))
+    cells = sum(counts[name] * len(shape) for name, shape in PIECE_SHAPES)
+    if cells > width * height:
+        raise ValueError("{} cells of pieces do not fit on a {}x{} board".format(cells, width, height))
+    order = sorted(PIECE_SHAPES, key=lambda piece_shape: -len(piece_shape[1]))
+    for _ in range(attempts):
+        pieces = place_pieces(height, width, counts, order, rng)
+        if pieces is not None:
+            return Board(height, pieces, width)
+    raise ValueError("could not place the pieces after {} attempts".format(attempts))
+
+def place_pieces(height, width, counts, order, rng):
+    """
+    Makes one attempt at placing every piece at a random free position.
+
+    :return: The placed pieces, or None if some piece had no room left.
+    :rtype: list[Piece] or None
+    """
+    occupied = set()
+    pieces = []
+    for name, shape in order:
+        for _ in range(counts[name]):
+            spots = [(x, y) for y in range(height) for x in range(width)
+                     if all(x + dx < width and y + dy < height and (x + dx, y + dy) not in occupied
+                            for dx, dy in shape)]
+            if not spots:
+                return None
+            x, y = rng.choice(spots)
+            occupied.update((x + dx, y + dy) for dx, dy in shape)
+            pieces.append(Piece(name == "two_by_two", name == "single", x, y,
+                                name if name in ("h", "v") else None))
+    return pieces
+
+def random_walk(board, length, rng):
+    """
+    Makes up to the given number of random legal moves from a board without
+    revisiting a board, so the result is at most that many moves away.
+
+    :param board: The starting board.
+    :type board: Board
+    :param length: The number of moves to make.
+    :type length: int
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :return: The board reached at the end of the walk.
+    :rtype: Board
+    """
+    visited = {pack_board(board)}
+    for _ in range(length):
+        successors = [successor for piece in board.pieces for successor in slide_piece(board, piece)
+                      if pack_board(successor) not in visited]
+        if not successors:
+            break # Every neighbour has been visited already
+        board = rng.choice(successors)
+        visited.add(pack_board(board))
+    return board
+
+def generate_puzzle(height, inventory, depth, rng, width=4):
+    """
+    Returns a random (initial board, goal board) pair at most depth moves apart.
+
+    :param height: The height of the board.
+    :type height: int
+    :param inventory: The number of 2x2, 1x1, horizontal and vertical pieces.
+    :type inventory: tuple[int, int, int, int]
+    :param depth: The length of the random walk from the initial board to the goal board.
+    :type depth: int
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :param width: The width of the board.
+    :type width: int
+    :rtype: tuple[Board, Board]
+    """
+    board = random_board(height, inventory, rng, width)
+    goal_board = random_walk(board, depth, rng)
+    assert check_invariants(board, goal_board)
+    return board, goal_board
+
+def write_puzzle(board, goal_board):
+    """
+    Prints a puzzle in the input file format: the initial board, an empty line and the goal board.
+
+    :param board: The initial board.
+    :type board: Board
+    :param goal_board: The goal board.
+    :type goal_board: Board
+    """
+    board.display()
+    print("")
+    goal_board.display()
+
+def write_corpus(filename, height, inventory, depth, count, rng, width=4):
+    """
+    Writes count random puzzles of the same height and depth to one multi-puzzle file.
+
+    :param filename: The name of the file to write.
+    :type filename: str
+    :param height: The height of the boards.
+    :type height: int
+    :param inventory: The number of 2x2, 1x1, horizontal and vertical pieces.
+    :type inventory: tuple[int, int, int, int]
+    :param depth: The length of the random walk for each puzzle.
+    :type depth: int
+    :param count: The number of puzzles.
+    :type count: int
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :param width: The width of the boards.
+    :type width: int
+    """
+    with open(filename, 'w') as corpus_file, redirect_stdout(corpus_file):
+        for index in range(count):
+            if index > 0:
+                print("")
+            write_puzzle(*generate_puzzle(height, inventory, depth, rng, width))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        required=True,
+        help="The file to write the puzzles to ('-' for stdout)."
+    )
+    parser.add_argument(
+        "--height",
+        type=int,
+        default=5,
+        help="The height of the boards."
+    )
+    parser.add_argument(
+        "--width",
+        type=int,
+        default=4,
+        help="The width of the boards."
+    )
+    parser.add_argument(
+        "--inventory",
+        type=str,
+        help="The number of 2x2, 1x1, horizontal and vertical pieces, e.g. '1,4,1,4'. "
+             "Defaults to one 2x2, one horizontal and four vertical pieces with two empty cells."
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=20,
+        help="The number of random moves from each initial board to its goal board."
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=1,
+        help="The number of puzzles to write."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="The random seed, for reproducible puzzles."
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    try:
+        if args.inventory:
+            inventory = tuple(int(count) for count in args.inventory.split(","))
+            if len(inventory) != 4:
+                parser.error("--inventory needs four counts")
+        else:
+            inventory = default_inventory(args.height, args.width)
+        if args.outputfile == '-':
+            for index in range(args.count):
+                if index > 0:
+                    print("")
+                write_puzzle(*generate_puzzle(args.height, inventory, args.depth, rng, args.width))
+        else:
+            write_corpus(args.outputfile, args.height, inventory, args.depth, args.count, rng, args.width)
+    except ValueError as error:
+        parser.error(str(error))
@@ -0,0 +1,368 @@
+# Long-lived solver service for TileSlidingPuzzleSolver.py
+# Listens on a Unix socket (or a local TCP port) and solves puzzles in a pool of worker processes that stay
+# up between requests, so the interpreter start, the numpy/scipy imports, the SQLite solution cache and any
+# distance tables are paid for once per worker instead of once per puzzle.
+#
+# The protocol is one JSON object per line in each direction. A request looks like
+#     {"id": "p1", "puzzle": "<initial board>\n\n<goal board>\n", "algo": "astar", "deadline": 30}
+# where "id" is a string or an integer and "puzzle" is in the input file format. A request may also set
+# "weight", "max_nodes", "outputformat" ('boards' or 'moves') and "invariants" (false to skip the invariant
+# check). "deadline" is in seconds from when the request is received; a search that runs out of time answers
+# like the solver's --time-limit.
+# Requests on one connection are solved concurrently and answered as they finish with
+#     {"id": "p1", "status": "solved", "solution": "<solver output>", "budget_exhausted": false, "stats": {...}}
+# with status "solved", "no solution", "budget exhausted", "cancelled" or "error" (and an "error" message).
+# {"id": "p1", "cancel": true} cancels a request, whether it is still queued or already being searched.
+# Closing the connection cancels its unanswered requests.
+
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+
+#====================================================================================
+
+WORKER_ALGOS = ['astar', 'wastar', 'greedy', 'dfs', 'external'] # The solver's ALGOS, without importing it here
+CANCEL_SIGNAL = signal.SIGUSR1 # Sent to the worker running a request to interrupt its search
+
+class SearchCancelled(Exception):
+    """
+    Raised inside a worker when the request it is solving has been cancelled.
+    """
+
+# State of a worker process, set up once by init_worker and kept for every request it solves
+WORKER = {}
+
+def init_worker(cache_file, table_files, running, cancelled):
+    """
+    Prepares a worker process: imports the solver, opens the solution cache,
+    loads the distance tables and installs the cancellation signal handler.
+
+    :param cache_file: The SQLite solution cache shared by the workers, if any.
+    :type cache_file: Optional[str]
+    :param table_files: Distance table files to answer puzzles with matching goals from.
+    :type table_files: list[str]
+    :param running: Shared map from request id to the pid of the worker solving it.
+    :type running: dict
+    :param cancelled: Shared set (as a map to True) of the ids of cancelled requests.
+    :type cancelled: dict
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # The service shuts the pool down on Ctrl-C
+    import TileSlidingPuzzleSolver as solver
+    WORKER["solver"] = solver
+    WORKER["cache"] = solver.SolutionCache(cache_file) if cache_file else None
+    WORKER["tables"] = {}
+    for filename in table_files:
+        table = solver.DistanceTable.load(filename)
+        WORKER["tables"][(table.height, table.goal)] = table
+    WORKER["running"] = running
+    WORKER["cancelled"] = cancelled
+    WORKER["request"] = None
+    signal.signal(CANCEL_SIGNAL, interrupt_request)
+
+def interrupt_request(signum, frame):
+    # A late signal may arrive after the request finished, so only stop a request that really was cancelled.
+    # Looking that up talks to the manager process, which is safe as the worker only does so itself with
+    # the signal blocked (see cancel_signal_blocked).
+    request_id = WORKER["request"]
+    if request_id is not None and WORKER["cancelled"].get(request_id):
+        raise SearchCancelled()
+
+@contextmanager
+def cancel_signal_blocked():
+    """
+    Holds back the cancellation signal until the block ends.
+    """
+    signal.pthread_sigmask(signal.SIG_BLOCK, [CANCEL_SIGNAL])
+    try:
+        yield
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, [CANCEL_SIGNAL])
+
+def solve_request(request_id, puzzle, options, deadline_at):
+    """
+    Solves one request in a worker process.
+
+    :param request_id: The id of the request.
+    :type request_id: str
+    :param puzzle: The puzzle in the input file format.
+    :type puzzle: str
+    :param options: The request's "algo", "weight", "max_nodes", "outputformat" and "invariants" entries.
+    :type options: dict
+    :param deadline_at: The time.time() by which the request must be answered, if any.
+    :type deadline_at: Optional[float]
+    :return: The response, without its id.
+    :rtype: dict
+    """
+    try:
+        with cancel_signal_blocked():
+            WORKER["running"][request_id] = os.getpid()
+            WORKER["request"] = request_id
+            cancelled = WORKER["cancelled"].get(request_id) # Cancelled before this worker registered it
+        if cancelled:
+            raise SearchCancelled()
+        return run_request(puzzle, options, deadline_at)
+    except SearchCancelled:
+        return {"status": "cancelled"}
+    except ValueError as error:
+        return {"status": "error", "error": str(error)}
+    finally:
+        with cancel_signal_blocked():
+            WORKER["request"] = None
+            WORKER["running"].pop(request_id, None)
+
+def run_request(puzzle, options, deadline_at):
+    """
+    Parses and solves a puzzle the way the solver's command line does for one input file.
+
+    :return: The response, without its id.
+    :rtype: dict
+    :raises ValueError: If the puzzle is not well formed.
+    """
+    solver = WORKER["solver"]
+    puzzles = list(itertools.islice(solver.stream_puzzles(io.StringIO(puzzle)), 2))
+    if len(puzzles) != 1:
+        raise ValueError("a request must hold exactly one puzzle")
+    board, goal_board = puzzles[0]
+    stats = solver.SearchStats()
+    budget = None
+    if deadline_at is not None or options.get("max_nodes") is not None:
+        time_limit = None if deadline_at is None else deadline_at - time.time()
+        budget = solver.SearchBudget(time_limit, options.get("max_nodes"))
+    table = WORKER["tables"].get((goal_board.height, solver.pack_board(goal_board)))
+    if table is not None:
+        with stats.phase("search"):
+            solution = table.solve(board)
+        if solution is not None:
+            stats.solution_length = len(solution) - 1
+    else:
+        solution = solver.solve_puzzle(board, goal_board, options.get("algo", "astar"),
+                                       options.get("invariants", True), stats, budget,
+                                       options.get("weight", solver.DEFAULT_WEIGHT), cache=WORKER["cache"])
+    exhausted = budget is not None and budget.exhausted
+    output = io.StringIO()
+    with redirect_stdout(output):
+        solver.write_solution(solution, options.get("outputformat", "boards"), exhausted)
+    if solution is not None:
+        status = "solved"
+    else:
+        status = "budget exhausted" if exhausted else "no solution"
+    return {"status": status, "solution": output.getvalue(), "budget_exhausted": exhausted,
+            "stats": stats.as_dict()}
+
+
+class SolverService:
+    """
+    Accepts connections, hands their requests to the worker pool and writes
+    back the responses. Request ids are shared by all connections, so a
+    request can be cancelled from any of them.
+    """
+
+    OPTIONS = ["algo", "weight", "max_nodes", "outputformat", "invariants"] # Request entries passed to the worker
+
+    def __init__(self, workers, cache_file=None, table_files=()):
+        """
+        :param workers: The number of worker processes.
+        :type workers: int
+        :param cache_file: The SQLite solution cache for the workers, if any.
+        :type cache_file: Optional[str]
+        :param table_files: Distance table files loaded by every worker.
+        :type table_files: Sequence[str]
+        """
+        self.manager = multiprocessing.Manager()
+        self.running = self.manager.dict()
+        self.cancelled = self.manager.dict()
+        self.pool = ProcessPoolExecutor(workers, initializer=init_worker,
+                                        initargs=(cache_file, list(table_files), self.running, self.cancelled))
+        self.requests = {} # Request id -> future of the worker call
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serves one client connection until it is closed.
+        """
+        pending = {} # Request id -> task, for the requests of this connection
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    request_id = message["id"]
+                    if not isinstance(request_id, (str, int)):
+                        raise TypeError("request ids are strings or integers") # Also keeps them hashable
+                except (ValueError, KeyError, TypeError):
+                    self.respond(writer, {"id": None, "status": "error", "error": "malformed request"})
+                    continue
+                if message.get("cancel"):
+                    if not self.cancel(request_id):
+                        self.respond(writer, {"id": request_id, "status": "error", "error": "unknown request"})
+                    continue
+                error = self.check_request(message)
+                if error is not None:
+                    self.respond(writer, {"id": request_id, "status": "error", "error": error})
+                    continue
+                deadline_at = None if message.get("deadline") is None else time.time() + message["deadline"]
+                future = self.pool.submit(solve_request, request_id, message["puzzle"],
+                                          {key: message[key] for key in self.OPTIONS if key in message}, deadline_at)
+                self.requests[request_id] = future
+                task = asyncio.ensure_future(self.answer(request_id, future, writer))
+                pending[request_id] = task
+                task.add_done_callback(lambda done, request_id=request_id: pending.pop(request_id, None))
+        finally:
+            for request_id in list(pending):
+                self.cancel(request_id)
+            if pending:
+                await asyncio.gather(*pending.values(), return_exceptions=True)
+            writer.close()
+
+    def check_request(self, message):
+        """
+        Returns why a request can not be solved, or None if it can be handed to a worker.
+
+        :rtype: str or None
+        """
+        if message["id"] in self.requests:
+            return "a request with this id is already running"
+        if not isinstance(message.get("puzzle"), str):
+            return "the request has no puzzle"
+        if message.get("algo", "astar") not in WORKER_ALGOS:
+            return "unknown algo {!r}".format(message["algo"])
+        if message.get("outputformat", "boards") not in ("boards", "moves"):
+            return "unknown outputformat {!r}".format(message["outputformat"])
+        if message.get("deadline") is not None and not isinstance(message["deadline"], (int, float)):
+            return "the deadline must be a number of seconds"
+        if message.get("weight") is not None and not isinstance(message["weight"], (int, float)):
+            return "the weight must be a number"
+        if message.get("max_nodes") is not None and not isinstance(message["max_nodes"], int):
+            return "max_nodes must be a whole number of states"
+        return None
+
+    async def answer(self, request_id, future, writer):
+        """
+        Waits for a worker to solve a request and writes the response.
+        """
+        try:
+            response = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            response = {"status": "cancelled"} # Cancelled while still queued
+        except SearchCancelled:
+            response = {"status": "cancelled"} # Interrupted just as the worker finished
+        except Exception as error:
+            response = {"status": "error", "error": "worker failed: {}".format(error)}
+        finally:
+            self.requests.pop(request_id, None)
+            self.cancelled.pop(request_id, None)
+        response["id"] = request_id
+        self.respond(writer, response)
+
+    def cancel(self, request_id):
+        """
+        Cancels a request: a queued request is dropped and a running search is interrupted.
+
+        :return: False if no such request is in progress; otherwise, True.
+        :rtype: bool
+        """
+        future = self.requests.get(request_id)
+        if future is None:
+            return False
+        if not future.cancel():
+            # Already handed to a worker; the worker checks the flag when it registers the request
+            self.cancelled[request_id] = True
+            pid = self.running.get(request_id)
+            if pid is not None:
+                try:
+                    os.kill(pid, CANCEL_SIGNAL)
+                except ProcessLookupError:
+                    pass
+        return True
+
+    def respond(self, writer, response):
+        if not writer.is_closing():
+            writer.write((json.dumps(response) + "\n").encode("utf-8"))
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
+
+
+async def serve(service, socket_path=None, host="127.0.0.1", port=None):
+    """
+    Runs the service on a Unix socket, or on a TCP port of host if no socket path is given, until cancelled.
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path) # Left behind by a service that did not shut down cleanly
+        server = await asyncio.start_unix_server(service.handle_connection, path=socket_path)
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+    print("Listening on {}".format(socket_path or "{}:{}".format(host, port)), file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--socket",
+        type=str,
+        help="The Unix socket to listen on."
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="The address to listen on with --port."
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="The TCP port to listen on instead of a Unix socket."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="The number of worker processes solving puzzles."
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        help="A SQLite file of solved puzzles and goal distances shared by the workers."
+    )
+    parser.add_argument(
+        "--distance-table",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Distance table files (see TileSlidingPuzzleSolver.py --distance-table) loaded by every worker."
+    )
+    args = parser.parse_args()
+
+    if (args.socket is None) == (args.port is None):
+        parser.error("give exactly one of --socket and --port")
+    service = SolverService(args.workers, args.cache, args.distance_table)
+    try:
+        asyncio.run(serve(service, args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -8,7 +8,27 @@
 # Import statements
 import numpy as np
 from scipy.optimize import linear_sum_assignment
+import cProfile
+import functools
+import hashlib
 import heapq
+import io
+import itertools
+from array import array
+import json
+import mmap
+import os
+import pstats
+import shutil
+import signal
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+try:
+    import resource # Unix only, used for the peak memory reported with --stats
+except ImportError:
+    resource = None
 # Below statements from starter code
 import argparse
 import sys
@@ -66,13 +86,15 @@ class Board: # Class implementation from starter code
     Board class for setting up the playing board.
     """
 
-    def __init__(self, height, pieces):
+    def __init__(self, height, pieces, width=4):
         """
         :param pieces: The list of Pieces
         :type pieces: List[Piece]
+        :param width: The width of the board, 4 for the classic puzzle.
+        :type width: int
         """
 
-        self.width = 4
+        self.width = width
         self.height = height
         self.pieces = pieces
 
@@ -163,6 +185,280 @@ class State: # Class implementation from starter code with minor change
         return self.f < other.f
 
 
+class CachedPathState(State):
+    """
+    A frontier entry standing for the rest of a path stored in a
+    SolutionCache: its parent is a state whose exact distance to the goal is
+    cached, and its depth is the length of the whole solution through it.
+    When A* pops it, no other path on the frontier can be shorter, so the
+    search stops and completes the path from the cache.
+    """
+
+    def __init__(self, state, distance, f):
+        """
+        :param state: The state whose distance to the goal is cached.
+        :type state: State
+        :param distance: The cached number of moves from that state to the goal.
+        :type distance: int
+        :param f: The f value of the entry.
+        :type f: float
+        """
+        super().__init__(state.board, state.hfn, f, state.depth + distance, state)
+
+
+class SearchStats:
+    """
+    Counters and timings collected while solving a puzzle.
+    Searches only update them when a SearchStats instance is passed in, so
+    runs without --stats pay nothing beyond an "is not None" check.
+    """
+
+    def __init__(self):
+        self.expanded = 0 # States taken off the frontier and expanded
+        self.generated = 0 # Successor states created
+        self.duplicates = 0 # States taken off the frontier that were already explored
+        self.frontier_peak = 0 # Largest size the frontier reached
+        self.heuristic_calls = 0
+        self.heuristic_time = 0.0
+        self.solution_length = None # Number of moves in the solution, if one was found
+        self.budget_exhausted = False # Whether the search stopped because its budget ran out
+        self.suboptimality_bound = None # At most how many times longer than optimal an anytime solution is
+        self.cache_hit = None # "solution" or "distance" if a SolutionCache answered or shortened the search
+        self.phases = {} # Seconds spent in each phase (parse, invariants, search, write)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Adds the time spent in the body of a with statement to the given phase.
+
+        :param name: The name of the phase.
+        :type name: str
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self):
+        """
+        Returns the collected statistics, including the nodes expanded per second of search.
+
+        :rtype: dict
+        """
+        report = dict(vars(self))
+        search_time = self.phases.get("search", 0.0)
+        report["nodes_per_sec"] = self.expanded / search_time if search_time > 0 else None
+        return report
+
+
+class SearchBudget:
+    """
+    Limits on the time, number of expanded states and memory a search may use.
+    A search calls spend() once per expanded state and stops as soon as it
+    returns True, leaving exhausted set so the caller can tell a search that
+    ran out of budget from one that proved there is no solution.
+    """
+
+    MEMORY_CHECK_INTERVAL = 64 # Expansions between two (comparatively slow) memory checks
+
+    def __init__(self, time_limit=None, max_nodes=None, max_memory=None):
+        """
+        :param time_limit: Seconds the search may run for, counted from now.
+        :type time_limit: Optional[float]
+        :param max_nodes: The number of states the search may expand.
+        :type max_nodes: Optional[int]
+        :param max_memory: The memory, in megabytes, the process may hold while searching.
+        :type max_memory: Optional[float]
+        """
+        self.deadline = None if time_limit is None else time.perf_counter() + time_limit
+        self.max_nodes = max_nodes
+        self.max_memory_kb = None if max_memory is None else max_memory * 1024
+        self.nodes = 0
+        self.exhausted = False
+
+    def spend(self):
+        """
+        Counts one expanded state and checks every limit.
+
+        :return: True if the budget has run out; otherwise, False.
+        :rtype: bool
+        """
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            self.exhausted = True
+        elif self.deadline is not None and time.perf_counter() > self.deadline:
+            self.exhausted = True
+        elif (self.max_memory_kb is not None and self.nodes % self.MEMORY_CHECK_INTERVAL == 0
+              and (current_rss_kb() or 0) > self.max_memory_kb):
+            self.exhausted = True
+        return self.exhausted
+
+
+def stats_phase(stats, name):
+    """
+    Returns a context manager timing the given phase, or one that does nothing if stats is None.
+
+    :param stats: Collects the timing, if given.
+    :type stats: Optional[SearchStats]
+    :param name: The name of the phase.
+    :type name: str
+    """
+    return nullcontext() if stats is None else stats.phase(name)
+
+def peak_rss_kb():
+    """
+    Returns the peak resident memory of this process in kilobytes, or None if it is unavailable.
+
+    :rtype: int or None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak # macOS reports bytes, Linux kilobytes
+
+def current_rss_kb():
+    """
+    Returns the resident memory of this process now in kilobytes. Unlike the
+    peak, it goes down again once an earlier puzzle's search is freed. Where
+    /proc is not available (outside Linux) the peak is returned instead.
+
+    :rtype: int or None
+    """
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_kb()
+
+
+class StackSampler:
+    """
+    A statistical profiler: every interval seconds of CPU time it records
+    the call stack that is running and counts how often each distinct stack
+    was seen. The counts are written in the collapsed stack format read by
+    flamegraph.pl and speedscope. Needs the Unix profiling timer (SIGPROF).
+    """
+
+    available = hasattr(signal, "setitimer") and hasattr(signal, "SIGPROF")
+
+    def __init__(self, interval=0.001):
+        """
+        :param interval: Seconds of CPU time between two samples.
+        :type interval: float
+        """
+        self.interval = interval
+        self.counts = {} # Collapsed stack -> number of samples
+
+    def sample(self, signum, frame):
+        stack = []
+        while frame is not None: # frame is the one interrupted by the signal, so the walk starts at the leaf
+            code = frame.f_code
+            stack.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+        key = ";".join(reversed(stack))
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def write(self, filename):
+        """
+        Writes one "frame;frame;...;frame count" line per distinct stack.
+
+        :param filename: The file to write.
+        :type filename: str
+        """
+        with open(filename, "w") as collapsed_file:
+            for stack, count in sorted(self.counts.items()):
+                collapsed_file.write("{} {}\n".format(stack, count))
+
+
+class SearchProfiler:
+    """
+    Profiles the searches run with --profile, either deterministically with
+    cProfile (exact call counts and per-function times, slowed down by the
+    profiler itself) or with a StackSampler (proportional times at little
+    cost, as flame graph input). The two are never run together, since the
+    samples would then mostly measure cProfile's own hooks. The call counts of
+    the Board, State and Piece constructors give the number of objects
+    allocated per expanded state.
+    """
+
+    ALLOCATED_CLASSES = ["Board", "State", "Piece"] # Classes whose constructions are counted
+
+    def __init__(self, interval=0.001, sample=False):
+        """
+        :param interval: Seconds of CPU time between two stack samples.
+        :type interval: float
+        :param sample: Take stack samples instead of running cProfile (needs StackSampler.available).
+        :type sample: bool
+        """
+        self.profile = None if sample else cProfile.Profile()
+        self.sampler = StackSampler(interval) if sample else None
+
+    @contextmanager
+    def running(self):
+        """
+        Profiles the body of a with statement, adding to what was recorded before.
+        """
+        if self.sampler is not None:
+            self.sampler.start()
+        else:
+            self.profile.enable()
+        try:
+            yield
+        finally:
+            if self.sampler is not None:
+                self.sampler.stop()
+            else:
+                self.profile.disable()
+
+    def allocations(self, expanded):
+        """
+        Returns the number of Board, State and Piece objects constructed per expanded state.
+
+        :param expanded: The number of states expanded while profiling.
+        :type expanded: int
+        :rtype: dict[str, float]
+        """
+        calls = dict.fromkeys(self.ALLOCATED_CLASSES, 0)
+        for (filename, line, name), (_, ncalls, _, _, _) in pstats.Stats(self.profile).stats.items():
+            if name == "__init__" and filename == __file__:
+                for class_name in self.ALLOCATED_CLASSES:
+                    if globals()[class_name].__init__.__code__.co_firstlineno == line:
+                        calls[class_name] += ncalls
+        return {class_name: count / expanded if expanded else None for class_name, count in calls.items()}
+
+    def write(self, prefix, expanded):
+        """
+        Writes prefix.collapsed when sampling, and otherwise prefix.pstats (for
+        pstats or snakeviz) and prefix.txt, a summary of the functions with
+        the most time and the allocations per expanded state.
+
+        :param prefix: The path the file names start with.
+        :type prefix: str
+        :param expanded: The number of states expanded while profiling.
+        :type expanded: int
+        """
+        if self.sampler is not None:
+            self.sampler.write(prefix + ".collapsed")
+            return
+        self.profile.dump_stats(prefix + ".pstats")
+        summary = io.StringIO()
+        pstats.Stats(self.profile, stream=summary).sort_stats("tottime").print_stats(25)
+        summary.write("Allocations per expanded state ({} states expanded)\n".format(expanded))
+        for class_name, per_node in self.allocations(expanded).items():
+            summary.write("    {:<6} {}\n".format(class_name, "-" if per_node is None else "{:.2f}".format(per_node)))
+        with open(prefix + ".txt", "w") as summary_file:
+            summary_file.write(summary.getvalue())
+
+
 def goal_test(state, goal_state):
     """
     Checks if the given state is the goal state.
@@ -241,7 +537,7 @@ def total_piece_type_dist(matrix):
         total += matrix[row][col]
     return total
 
-def heuristic(state, goal_state):
+def heuristic(state, goal_state, stats=None):
     """
     A heuristic function that calculates a heuristic value for a given state.
     The heuristic is calculated by pairing each piece in the current state with
@@ -254,7 +550,11 @@ def heuristic(state, goal_state):
     :type state: State
     :param goal_state: The goal state.
     :type goal_state: State
+    :param stats: Collects the number of calls and time spent, if given.
+    :type stats: Optional[SearchStats]
     """
+    if stats is not None:
+        start = time.perf_counter()
     heuristic_total = 0
     curr_pieces = piece_tracker(state) # Track pieces in the current state
     goal_pieces = piece_tracker(goal_state) # Track pieces in the goal state
@@ -271,7 +571,28 @@ def heuristic(state, goal_state):
                 heuristic_total += total_piece_type_dist(matrix)
             else:
                 heuristic_total += total_piece_type_dist(matrix)
+    if stats is not None:
+        stats.heuristic_calls += 1
+        stats.heuristic_time += time.perf_counter() - start
     return heuristic_total
+
+def admissible_heuristic(state, goal_state):
+    """
+    Like heuristic, but adds the matching distance of each piece type once.
+    Every move slides one piece by one cell, so this never overestimates the
+    number of moves left. heuristic itself counts the 2x2 and 1x1 distances
+    twice, so half of it is never more than this value.
+
+    :param state: A given state.
+    :type state: State
+    :param goal_state: The goal state.
+    :type goal_state: State
+    :rtype: int
+    """
+    curr_pieces = piece_tracker(state)
+    goal_pieces = piece_tracker(goal_state)
+    return sum(total_piece_type_dist(manhattan_matrix(curr_pieces[piece_type], goal_pieces[piece_type]))
+               for piece_type in curr_pieces if curr_pieces[piece_type])
     
 def check_2_by_2_move(piece, board):
     """
@@ -286,8 +607,8 @@ def check_2_by_2_move(piece, board):
     """
     successor_boards = []
     # Check move to the right
-    if 0 <= piece.coord_x + 2 <= 3:
-        new_board = Board(board.height, board.pieces.copy())
+    if 0 <= piece.coord_x + 2 <= board.width - 1:
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y][piece.coord_x + 2] == '.' and board.grid[piece.coord_y + 1][piece.coord_x + 2] == '.':
             new_board.grid[piece.coord_y][piece.coord_x + 2] = '1'
@@ -300,8 +621,8 @@ def check_2_by_2_move(piece, board):
             new_board.pieces[index] = new_piece
             successor_boards.append(new_board)
     # Check move to the left
-    if 0 <= piece.coord_x - 1 <= 3:
-        new_board = Board(board.height, board.pieces.copy())
+    if 0 <= piece.coord_x - 1 <= board.width - 1:
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y][piece.coord_x - 1] == '.' and board.grid[piece.coord_y + 1][piece.coord_x - 1] == '.':
             new_board.grid[piece.coord_y][piece.coord_x - 1] = '1'
@@ -315,7 +636,7 @@ def check_2_by_2_move(piece, board):
             successor_boards.append(new_board)
     # Check move upward
     if 0 <= piece.coord_y - 1 <= board.height - 1:
-        new_board = Board(board.height, board.pieces.copy())
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y - 1][piece.coord_x] == '.' and board.grid[piece.coord_y - 1][piece.coord_x + 1] == '.':
             new_board.grid[piece.coord_y - 1][piece.coord_x] = '1'
@@ -329,7 +650,7 @@ def check_2_by_2_move(piece, board):
             successor_boards.append(new_board)
     # Check move downward
     if 0 <= piece.coord_y + 2 <= board.height - 1:
-        new_board = Board(board.height, board.pieces.copy())
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y + 2][piece.coord_x] == '.' and board.grid[piece.coord_y + 2][piece.coord_x + 1] == '.':
             new_board.grid[piece.coord_y + 2][piece.coord_x] = '1'
@@ -356,8 +677,8 @@ def check_horiz_move(piece, board):
     """
     successor_boards = []
     # Check move to the right
-    if 0 <= piece.coord_x + 2 <= 3:
-        new_board = Board(board.height, board.pieces.copy())
+    if 0 <= piece.coord_x + 2 <= board.width - 1:
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y][piece.coord_x + 2] == '.':
             new_board.grid[piece.coord_y][piece.coord_x + 2] = '>'
@@ -369,8 +690,8 @@ def check_horiz_move(piece, board):
             new_board.pieces[index] = new_piece
             successor_boards.append(new_board)
     # Check move to the left
-    if 0 <= piece.coord_x - 1 <= 3:
-        new_board = Board(board.height, board.pieces.copy())
+    if 0 <= piece.coord_x - 1 <= board.width - 1:
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y][piece.coord_x - 1] == '.':
             new_board.grid[piece.coord_y][piece.coord_x - 1] = '<'
@@ -383,7 +704,7 @@ def check_horiz_move(piece, board):
             successor_boards.append(new_board)
     # Check move upward
     if 0 <= piece.coord_y - 1 <= board.height - 1:
-        new_board = Board(board.height, board.pieces.copy())
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y - 1][piece.coord_x] == '.' and board.grid[piece.coord_y - 1][piece.coord_x + 1] == '.':
             new_board.grid[piece.coord_y - 1][piece.coord_x] = '<'
@@ -397,7 +718,7 @@ def check_horiz_move(piece, board):
             successor_boards.append(new_board)
     # Check move downward
     if 0 <= piece.coord_y + 1 <= board.height - 1:
-        new_board = Board(board.height, board.pieces.copy())
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y + 1][piece.coord_x] == '.' and board.grid[piece.coord_y + 1][piece.coord_x + 1] == '.':
             new_board.grid[piece.coord_y + 1][piece.coord_x] = '<'
@@ -425,7 +746,7 @@ def check_vert_move(piece, board):
     successor_boards = []
     # Check move downward
     if 0 <= piece.coord_y + 2 <= board.height - 1:
-        new_board = Board(board.height, board.pieces.copy())
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y + 2][piece.coord_x] == '.':
             new_board.grid[piece.coord_y + 2][piece.coord_x] = 'v'
@@ -438,7 +759,7 @@ def check_vert_move(piece, board):
             successor_boards.append(new_board)
     # Check move upward
     if 0 <= piece.coord_y - 1 <= board.height - 1:
-        new_board = Board(board.height, board.pieces.copy())
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y - 1][piece.coord_x] == '.':
             new_board.grid[piece.coord_y - 1][piece.coord_x] = '^'
@@ -450,8 +771,8 @@ def check_vert_move(piece, board):
             new_board.pieces[index] = new_piece
             successor_boards.append(new_board)
     # Check move to the right
-    if 0 <= piece.coord_x + 1 <= 3:
-        new_board = Board(board.height, board.pieces.copy())
+    if 0 <= piece.coord_x + 1 <= board.width - 1:
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y][piece.coord_x + 1] == '.' and board.grid[piece.coord_y + 1][piece.coord_x + 1] == '.':
             new_board.grid[piece.coord_y][piece.coord_x + 1] = '^'
@@ -464,8 +785,8 @@ def check_vert_move(piece, board):
             new_board.pieces[index] = new_piece
             successor_boards.append(new_board)
     # Check move to the left
-    if 0 <= piece.coord_x - 1 <= 3:
-        new_board = Board(board.height, board.pieces.copy())
+    if 0 <= piece.coord_x - 1 <= board.width - 1:
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y][piece.coord_x - 1] == '.' and board.grid[piece.coord_y + 1][piece.coord_x - 1] == '.':
             new_board.grid[piece.coord_y][piece.coord_x - 1] = '^'
@@ -493,7 +814,7 @@ def check_single_move(piece, board):
     successor_boards = []
     # Check move downward
     if 0 <= piece.coord_y + 1 <= board.height - 1:
-        new_board = Board(board.height, board.pieces.copy())
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y + 1][piece.coord_x] == '.':
             new_board.grid[piece.coord_y + 1][piece.coord_x] = '2'
@@ -505,7 +826,7 @@ def check_single_move(piece, board):
             successor_boards.append(new_board)
     # Check move upward
     if 0 <= piece.coord_y - 1 <= board.height - 1:
-        new_board = Board(board.height, board.pieces.copy())
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y - 1][piece.coord_x] == '.':
             new_board.grid[piece.coord_y - 1][piece.coord_x] = '2'
@@ -516,8 +837,8 @@ def check_single_move(piece, board):
             new_board.pieces[index] = new_piece
             successor_boards.append(new_board)
     # Check move to the right
-    if 0 <= piece.coord_x + 1 <= 3:
-        new_board = Board(board.height, board.pieces.copy())
+    if 0 <= piece.coord_x + 1 <= board.width - 1:
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y][piece.coord_x + 1] == '.':
             new_board.grid[piece.coord_y][piece.coord_x + 1] = '2'
@@ -528,8 +849,8 @@ def check_single_move(piece, board):
             new_board.pieces[index] = new_piece
             successor_boards.append(new_board)
     # Check move to the left
-    if 0 <= piece.coord_x - 1 <= 3:
-        new_board = Board(board.height, board.pieces.copy())
+    if 0 <= piece.coord_x - 1 <= board.width - 1:
+        new_board = Board(board.height, board.pieces.copy(), board.width)
         new_board.grid = [row[:] for row in board.grid]
         if board.grid[piece.coord_y][piece.coord_x - 1] == '.':
             new_board.grid[piece.coord_y][piece.coord_x - 1] = '2'
@@ -572,7 +893,7 @@ def slide_piece(board, piece):
     return boards
 
 
-def generate_successors(state, goal_state):
+def generate_successors(state, goal_state, stats=None, weight=1, greedy=False):
     """
     Returns the successor states of a given state.
 
@@ -580,6 +901,12 @@ def generate_successors(state, goal_state):
     :type state: State
     :param goal_state: The goal state.
     :type goal_state: State
+    :param stats: Collects search statistics, if given.
+    :type stats: Optional[SearchStats]
+    :param weight: The weight of the heuristic in the f value, f = depth + weight * heuristic.
+    :type weight: float
+    :param greedy: Leave the depth out of the f value, f = weight * heuristic (greedy best-first search).
+    :type greedy: bool
     :return: A list of successor states generated from the given state.
     :rtype: list[State]
     """
@@ -592,11 +919,32 @@ def generate_successors(state, goal_state):
         for board in successor_boards:
             if board != None:
                 new_state = State(board, heuristic, 0, state.depth + 1, state)
-                new_state.f = heuristic(new_state, goal_state) + new_state.depth
+                new_state.f = weight * heuristic(new_state, goal_state, stats)
+                if not greedy:
+                    new_state.f += new_state.depth
                 successors.append(new_state)
+    if stats is not None:
+        stats.generated += len(successors)
     # Return the list of successor states
     return successors
 
+def boards_to_states(boards, parent=None):
+    """
+    Chains a list of boards into states, each the parent of the next.
+
+    :param boards: The boards of a path, in order.
+    :type boards: list[Board]
+    :param parent: The state the path continues from, if any.
+    :type parent: Optional[State]
+    :return: The states of the path (not including parent).
+    :rtype: list[State]
+    """
+    states = []
+    for board in boards:
+        parent = State(board, heuristic, 0, 0 if parent is None else parent.depth + 1, parent)
+        states.append(parent)
+    return states
+
 def get_solution(goal_state):
     """
     Constructs the solution path from the goal state to the initial state.
@@ -615,7 +963,7 @@ def get_solution(goal_state):
     # Return the complete solution path
     return sequence
 
-def dfs_search(state, goal_state):
+def dfs_search(state, goal_state, stats=None, budget=None, cache=None):
     """
     Performs a depth-first search to find a solution from the initial state to the goal state.
 
@@ -623,12 +971,19 @@ def dfs_search(state, goal_state):
     :type state: State
     :param goal_state: The goal state to reach.
     :type goal_state: State
+    :param stats: Collects search statistics, if given.
+    :type stats: Optional[SearchStats]
+    :param budget: Stops the search (returning None) once it runs out, if given.
+    :type budget: Optional[SearchBudget]
+    :param cache: Ends the search at the first state whose path to the goal is cached, if given.
+    :type cache: Optional[SolutionCache]
     :return: A list of states representing the solution path if a solution is found; otherwise, None.
     :rtype: list[State] or None
     """
     # Check if the initial state is already the goal state.
     if state.board == goal_state.board:
         return [state, goal_state]
+    goal_key = pack_board(goal_state.board)
     # Initialize the frontier and explored set.
     frontier = [state]
     explored = set()
@@ -636,57 +991,980 @@ def dfs_search(state, goal_state):
         # Pop the last state from the frontier.
         curr_state = frontier.pop()
         curr_board = curr_state.board
-        curr_tuple = tuple(map(tuple, curr_board.grid))
+        curr_tuple = pack_board(curr_board)
         # Process the state if it hasn't been explored.
         if curr_tuple not in explored:
             explored.add(curr_tuple)
+            if stats is not None:
+                stats.expanded += 1
+            if budget is not None and budget.spend():
+                return None
             # Return solution if the goal state is reached.
             if curr_state.board == goal_state.board:
                 return get_solution(curr_state)
+            if cache is not None and cache.distance(goal_key, curr_tuple) is not None:
+                return cache.complete_solution(curr_state, goal_key)
             # Add successors of the current state to the frontier.
-            successors = generate_successors(curr_state, goal_state)
+            successors = generate_successors(curr_state, goal_state, stats)
             frontier += successors
+            if stats is not None:
+                stats.frontier_peak = max(stats.frontier_peak, len(frontier))
+        elif stats is not None:
+            stats.duplicates += 1
     # Return None if no solution is found.
     return
 
-def a_star_search(state, goal_state):
+def a_star_search(state, goal_state, stats=None, budget=None, weight=1, cost_limit=None, greedy=False,
+                  checkpoint=None, cache=None, reopen=False, on_budget_exhausted=None):
     """
     Performs an A* search to find a solution from the initial state to the goal state.
+    With a weight above 1 this is weighted A* (f = depth + weight * heuristic),
+    and with greedy set it is greedy best-first search (f = heuristic). Both
+    usually expand fewer states than A* but may return a longer path.
 
     :param state: The initial state of the search.
     :type state: State
     :param goal_state: The goal state to reach.
     :type goal_state: State
+    :param stats: Collects search statistics, if given.
+    :type stats: Optional[SearchStats]
+    :param budget: Stops the search (returning None) once it runs out, if given.
+    :type budget: Optional[SearchBudget]
+    :param weight: The weight of the heuristic in the f value.
+    :type weight: float
+    :param cost_limit: Only look for solutions with fewer moves than this, if given.
+    :type cost_limit: Optional[int]
+    :param greedy: Order the frontier by the heuristic alone.
+    :type greedy: bool
+    :param checkpoint: Periodically saves the frontier and explored set, and resumes from them if asked to.
+        The checkpoint file is deleted once the search finishes, but kept if the budget runs out.
+    :type checkpoint: Optional[Checkpoint]
+    :param cache: Cached goal distances; a state with a cached distance adds a CachedPathState to the frontier.
+    :type cache: Optional[SolutionCache]
+    :param reopen: Expand an explored board again when it is reached with fewer moves, so that the frontier always
+        holds a state on a shortest path at its optimal depth (not used with a checkpoint).
+    :type reopen: bool
+    :param on_budget_exhausted: Called with the states left on the frontier when the budget runs out, if given.
+    :type on_budget_exhausted: Optional[Callable[[list[State]], None]]
     :return: A list of states representing the solution path if a solution is found; otherwise, None.
     :rtype: list[State] or None
     """
     # Check if the initial state is already the goal state.
     if state.board == goal_state.board:
         return [state, goal_state]
-    # Initialize the priority queue and explored set.
-    frontier = [state]
-    heapq.heapify(frontier)
-    explored = set()
-    while frontier:
-        # Pop the state with the lowest cost from the frontier.
-        curr_state = heapq.heappop(frontier)
-        curr_board = curr_state.board
-        curr_tuple = tuple(map(tuple, curr_board.grid))
-        # Process the state if it hasn't been explored.
-        if curr_tuple not in explored:
-            explored.add(curr_tuple)
-            # Return solution if the goal state is reached.
-            if curr_state.board == goal_state.board:
-                return get_solution(curr_state)
-            # Add successors to the frontier and reorder it based on the f value and depth of both states
-            successors = generate_successors(curr_state, goal_state)
-            frontier += successors
+    goal_key = pack_board(goal_state.board)
+    # SIGTERM saves a checkpoint only while a checkpointed search is running
+    with nullcontext() if checkpoint is None else checkpoint.stopping_on_sigterm():
+        if checkpoint is not None and checkpoint.restore(state, goal_state):
+            frontier, explored = checkpoint.frontier, checkpoint.explored
+        else:
+            # Initialize the priority queue and explored set (a dict mapping each explored board to its
+            # parent's when checkpointing, or to its depth when reopening).
+            frontier = [state]
             heapq.heapify(frontier)
+            explored = set() if checkpoint is None and not reopen else {}
+        while frontier:
+            # Pop the state with the lowest cost from the frontier.
+            curr_state = heapq.heappop(frontier)
+            # Finish the path from the cache once it is the best entry on the frontier.
+            if isinstance(curr_state, CachedPathState):
+                if checkpoint is not None:
+                    checkpoint.remove(state, goal_state)
+                return cache.complete_solution(curr_state.parent, goal_key)
+            curr_board = curr_state.board
+            curr_tuple = pack_board(curr_board)
+            # Process the state if it hasn't been explored (or, when reopening, only with more moves).
+            if curr_tuple not in explored or (reopen and curr_state.depth < explored[curr_tuple]):
+                # Parents are only needed to rebuild solution paths from a checkpoint
+                if reopen:
+                    explored[curr_tuple] = curr_state.depth
+                elif checkpoint is None:
+                    explored.add(curr_tuple)
+                else:
+                    explored[curr_tuple] = None if curr_state.parent is None else pack_board(curr_state.parent.board)
+                if stats is not None:
+                    stats.expanded += 1
+                if budget is not None and budget.spend():
+                    if on_budget_exhausted is not None:
+                        on_budget_exhausted(frontier + [curr_state])
+                    return None
+                # Return solution if the goal state is reached.
+                if curr_state.board == goal_state.board:
+                    if checkpoint is not None:
+                        checkpoint.remove(state, goal_state)
+                    return get_solution(curr_state)
+                distance = None if cache is None else cache.distance(goal_key, curr_tuple)
+                if distance is not None:
+                    heapq.heappush(frontier, CachedPathState(curr_state, distance,
+                                                             weight * distance + (0 if greedy else curr_state.depth)))
+                # Add successors to the frontier and reorder it based on the f value and depth of both states
+                successors = generate_successors(curr_state, goal_state, stats, weight, greedy)
+                if cost_limit is not None:
+                    successors = [successor for successor in successors if successor.depth < cost_limit]
+                frontier += successors
+                heapq.heapify(frontier)
+                if stats is not None:
+                    stats.frontier_peak = max(stats.frontier_peak, len(frontier))
+                if checkpoint is not None and checkpoint.due():
+                    checkpoint.save(frontier, explored, state, goal_state)
+            elif stats is not None:
+                stats.duplicates += 1
     # Return None if no solution is found.
+    if checkpoint is not None:
+        checkpoint.remove(state, goal_state)
     return
         
+ANYTIME_WEIGHTS = [5, 3, 2, 1.5, 1] # Heuristic weights tried in turn by anytime_search
+
+def anytime_search(state, goal_state, budget, stats=None, weights=ANYTIME_WEIGHTS):
+    """
+    Runs weighted A* searches with decreasing weights, repeating the last
+    one, until the budget runs out, keeping the shortest solution found so
+    far. Each search only looks for solutions shorter than the best one
+    already known. The searches with the last weight expand a board again
+    when they find a shorter path to it, so one that completes without a
+    solution proves the best one optimal.
+
+    When the budget runs out, stats.suboptimality_bound is set to the most
+    the best solution can be longer than optimal, as a factor (see
+    suboptimality_bound), or to 1 once it is proven optimal.
+
+    :param state: The initial state of the search.
+    :type state: State
+    :param goal_state: The goal state to reach.
+    :type goal_state: State
+    :param budget: The time, node and memory limits shared by all the searches.
+    :type budget: SearchBudget
+    :param stats: Collects search statistics, if given.
+    :type stats: Optional[SearchStats]
+    :param weights: The heuristic weights to try, in decreasing order ending with 1.
+    :type weights: list[float]
+    :return: The best solution found, or None.
+    :rtype: list[State] or None
+    """
+    best = None
+    for weight in itertools.chain(weights, itertools.repeat(weights[-1])):
+        cost_limit = None if best is None else len(best) - 1
+        reopen = weight == weights[-1] # Reopening slows the weighted searches down too much to pay off
+        frontier = [] if reopen else None
+        solution = a_star_search(state, goal_state, stats, budget, weight, cost_limit, reopen=reopen,
+                                 on_budget_exhausted=None if frontier is None else frontier.extend)
+        if budget.exhausted:
+            if best is not None and stats is not None:
+                stats.suboptimality_bound = suboptimality_bound(len(best) - 1, state, goal_state, frontier, weight)
+            break
+        if solution is not None:
+            best = solution
+        elif best is None:
+            return None # The search ran to completion without reaching the goal
+        elif reopen:
+            if stats is not None:
+                stats.suboptimality_bound = 1.0 # No shorter solution exists
+            break
+    if stats is not None:
+        stats.budget_exhausted = budget.exhausted
+    return best
+
+def suboptimality_bound(length, state, goal_state, frontier=None, weight=1):
+    """
+    Returns how many times longer than optimal a solution can at most be,
+    dividing its length by a lower bound on the optimal one: the
+    admissible_heuristic of the initial state or, given the frontier left by a
+    reopening search for a shorter solution that was cut short, the lowest
+    depth + admissible_heuristic on it if that is higher. Any shorter solution
+    passes through a state on such a frontier at its optimal depth.
+
+    Half the heuristic already stored in each f value never exceeds
+    admissible_heuristic, so the frontier is visited in order of that cheap
+    estimate and the exact value is only computed until the estimate reaches
+    the lowest exact value found.
+
+    :param length: The number of moves in the solution.
+    :type length: int
+    :param state: The initial state.
+    :type state: State
+    :param goal_state: The goal state.
+    :type goal_state: State
+    :param frontier: The states left on the frontier of a reopening search, if any.
+    :type frontier: Optional[list[State]]
+    :param weight: The heuristic weight of the search that left the frontier.
+    :type weight: float
+    :rtype: float
+    """
+    def estimate(frontier_state):
+        return frontier_state.depth + (frontier_state.f - frontier_state.depth) / (2 * weight)
+
+    lowest = admissible_heuristic(state, goal_state)
+    if frontier is not None:
+        frontier_lowest = length
+        for frontier_state in sorted(frontier, key=estimate):
+            if estimate(frontier_state) >= frontier_lowest:
+                break
+            frontier_lowest = min(frontier_lowest, frontier_state.depth + admissible_heuristic(frontier_state, goal_state))
+        lowest = max(lowest, frontier_lowest)
+    return length / lowest if lowest > 0 else float('inf')
+
+class Checkpoint:
+    """
+    Saves the frontier and explored set of an A* search to a file every
+    interval expansions (and when the process receives SIGTERM during the
+    search), and loads them back to resume the search. Each puzzle has its
+    own file, named after the given file name and a hash of the puzzle, so
+    the searches of different puzzles in one input file do not overwrite
+    each other's checkpoints.
+
+    The file is plain text. A header line holds the board height and the
+    packed initial and goal boards as JSON. Then come the explored boards,
+    one "board parent" line each, and the frontier, one "board parent depth f"
+    line each, with every board in the packed format of pack_board ('-' for
+    no parent). The parents let a resumed search rebuild its solution path.
+    """
+
+    HEADER = "# tile sliding puzzle checkpoint v1"
+
+    def __init__(self, filename, interval=10000, resume=False):
+        """
+        :param filename: The checkpoint file.
+        :type filename: str
+        :param interval: The number of expansions between two saves.
+        :type interval: int
+        :param resume: Whether to continue from the checkpoint file if it holds the same puzzle.
+        :type resume: bool
+        """
+        self.filename = filename
+        self.interval = interval
+        self.resume = resume
+        self.expansions = 0
+        self.stop_requested = False # Set by a signal handler to save and stop at the next expansion
+        self.frontier = None
+        self.explored = None
+
+    def path(self, state, goal_state):
+        """
+        Returns the checkpoint file of a puzzle.
+
+        :param state: The initial state of the search.
+        :type state: State
+        :param goal_state: The goal state of the search.
+        :type goal_state: State
+        :rtype: str
+        """
+        puzzle = "{} {}".format(pack_board(state.board), pack_board(goal_state.board))
+        return "{}.{}".format(self.filename, hashlib.sha1(puzzle.encode("ascii")).hexdigest()[:12])
+
+    @contextmanager
+    def stopping_on_sigterm(self):
+        """
+        Makes SIGTERM save the search and stop at the next expansion while the
+        body of a with statement runs, restoring the previous handler after.
+        A SIGTERM that arrived too late to be saved is passed on to that handler.
+        """
+        def request_stop(signum, frame):
+            self.stop_requested = True
+        previous = signal.signal(signal.SIGTERM, request_stop)
+        try:
+            yield
+        finally:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL if previous is None else previous)
+            if self.stop_requested:
+                self.stop_requested = False
+                os.kill(os.getpid(), signal.SIGTERM)
+
+    def due(self):
+        """
+        Counts one expansion.
+
+        :return: True if the search should save a checkpoint now; otherwise, False.
+        :rtype: bool
+        """
+        self.expansions += 1
+        return self.stop_requested or self.expansions % self.interval == 0
+
+    def save(self, frontier, explored, state, goal_state):
+        """
+        Writes the search to the checkpoint file, replacing it atomically so a
+        crash while saving leaves the previous checkpoint intact. Exits the
+        process afterwards if a stop was requested.
+
+        :param frontier: The frontier of the search.
+        :type frontier: list[State]
+        :param explored: The explored boards, each mapped to its parent's board (None for the initial board).
+        :type explored: dict[str, Optional[str]]
+        :param state: The initial state of the search.
+        :type state: State
+        :param goal_state: The goal state of the search.
+        :type goal_state: State
+        """
+        header = {"height": state.board.height, "initial": pack_board(state.board), "goal": pack_board(goal_state.board)}
+        filename = self.path(state, goal_state)
+        temporary = filename + ".tmp"
+        with open(temporary, "w") as checkpoint_file:
+            checkpoint_file.write(self.HEADER + "\n")
+            checkpoint_file.write(json.dumps(header) + "\n")
+            checkpoint_file.write("explored {}\n".format(len(explored)))
+            for key, parent_key in explored.items():
+                checkpoint_file.write("{} {}\n".format(key, parent_key or '-'))
+            checkpoint_file.write("frontier {}\n".format(len(frontier)))
+            for frontier_state in frontier:
+                parent = frontier_state.parent
+                checkpoint_file.write("{} {} {} {}\n".format(pack_board(frontier_state.board),
+                    '-' if parent is None else pack_board(parent.board), frontier_state.depth, frontier_state.f))
+        os.replace(temporary, filename)
+        if self.stop_requested:
+            self.stop_requested = False # Handled here, so stopping_on_sigterm does not signal again
+            sys.exit("search stopped, checkpoint saved to {}".format(filename))
+
+    def restore(self, state, goal_state):
+        """
+        Loads the checkpoint file into self.frontier and self.explored if
+        resuming was asked for and the file holds a search of the same puzzle.
+
+        :param state: The initial state of the search.
+        :type state: State
+        :param goal_state: The goal state of the search.
+        :type goal_state: State
+        :return: True if the search was restored; otherwise, False.
+        :rtype: bool
+        """
+        filename = self.path(state, goal_state)
+        if not self.resume or not os.path.exists(filename):
+            return False
+        with open(filename, "r") as checkpoint_file:
+            if checkpoint_file.readline().rstrip("\n") != self.HEADER:
+                raise ValueError("{} is not a checkpoint file".format(filename))
+            header = json.loads(checkpoint_file.readline())
+            if header["initial"] != pack_board(state.board) or header["goal"] != pack_board(goal_state.board):
+                return False
+            height = header["height"]
+            explored = {}
+            for _ in range(int(checkpoint_file.readline().split()[1])):
+                key, parent_key = checkpoint_file.readline().split()
+                explored[key] = None if parent_key == '-' else parent_key
+            entries = [checkpoint_file.readline().split()
+                       for _ in range(int(checkpoint_file.readline().split()[1]))]
+        states = {}
+        frontier = []
+        for key, parent_key, depth, f in entries:
+            parent = None if parent_key == '-' else explored_state(parent_key, explored, states, height)
+            frontier.append(State(unpack_board(key, height), heuristic, float(f) if '.' in f else int(f),
+                                  int(depth), parent))
+        heapq.heapify(frontier)
+        self.frontier, self.explored = frontier, explored
+        return True
+
+    def remove(self, state, goal_state):
+        """
+        Deletes the checkpoint file of a puzzle once its search has finished.
+
+        :param state: The initial state of the search.
+        :type state: State
+        :param goal_state: The goal state of the search.
+        :type goal_state: State
+        """
+        filename = self.path(state, goal_state)
+        if os.path.exists(filename):
+            os.remove(filename)
+
+def explored_state(key, explored, states, height):
+    """
+    Rebuilds the state of an explored board, along with the chain of parent
+    states leading back to the initial board.
+
+    :param key: The packed board.
+    :type key: str
+    :param explored: The explored boards, each mapped to its parent's board.
+    :type explored: dict[str, Optional[str]]
+    :param states: States already rebuilt, by packed board; updated in place.
+    :type states: dict[str, State]
+    :param height: The height of the board.
+    :type height: int
+    :rtype: State
+    """
+    chain = []
+    while key is not None and key not in states:
+        chain.append(key)
+        key = explored[key]
+    parent = None if key is None else states[key]
+    for key in reversed(chain):
+        parent = State(unpack_board(key, height), heuristic, 0, 0 if parent is None else parent.depth + 1, parent)
+        states[key] = parent
+    return parent
+
+class LayerFile:
+    """
+    A sorted file of fixed width records (packed boards encoded as ASCII),
+    memory-mapped for reading so that layers far larger than memory can be
+    scanned in order or searched with a binary search.
+    """
+
+    def __init__(self, filename, record_size):
+        """
+        :param filename: The layer file, which must already be written.
+        :type filename: str
+        :param record_size: The number of bytes in each record (the number of cells on the board).
+        :type record_size: int
+        """
+        self.record_size = record_size
+        self.count = os.path.getsize(filename) // record_size
+        self.file = open(filename, "rb")
+        # Empty files can not be mapped
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        size = self.record_size
+        for offset in range(0, self.count * size, size):
+            yield self.data[offset:offset + size]
+
+    def __contains__(self, record):
+        return find_record(self.data, self.record_size, self.count, record) >= 0
+
+    def close(self):
+        if self.count:
+            self.data.close()
+        self.file.close()
+
+def find_record(data, record_size, count, record):
+    """
+    Binary searches sorted fixed width records.
+
+    :param data: The records, one after another in sorted order.
+    :type data: bytes or mmap.mmap
+    :param record_size: The number of bytes in each record.
+    :type record_size: int
+    :param count: The number of records.
+    :type count: int
+    :param record: The record to look for.
+    :type record: bytes
+    :return: The index of the record, or -1 if it is not there.
+    :rtype: int
+    """
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if data[middle * record_size:(middle + 1) * record_size] < record:
+            low = middle + 1
+        else:
+            high = middle
+    if low < count and data[low * record_size:(low + 1) * record_size] == record:
+        return low
+    return -1
+
+def write_sorted_run(records, filename):
+    """
+    Sorts records in memory, drops duplicates and writes them to a file.
+
+    :param records: The records to write.
+    :type records: list[bytes]
+    :param filename: The file to write.
+    :type filename: str
+    """
+    records.sort()
+    with open(filename, "wb") as run_file:
+        previous = None
+        for record in records:
+            if record != previous:
+                run_file.write(record)
+                previous = record
+
+# Cells covered by the piece starting with each character, relative to its top left corner
+PIECE_CELLS = {'1': [(0, 0, '1'), (1, 0, '1'), (0, 1, '1'), (1, 1, '1')], '<': [(0, 0, '<'), (1, 0, '>')],
+               '^': [(0, 0, '^'), (0, 1, 'v')], char_single: [(0, 0, char_single)]}
+# Directions tried for each piece, in the order of the check_*_move functions
+MOVE_ORDER = {'1': ['right', 'left', 'up', 'down'], '<': ['right', 'left', 'up', 'down'],
+              '^': ['down', 'up', 'right', 'left'], char_single: ['down', 'up', 'right', 'left']}
+
+@functools.lru_cache(maxsize=None)
+def move_table(width, height):
+    """
+    Lists every move on packed boards of one size, so that neighbour_keys
+    can make moves with string lookups instead of building Board objects.
+    The table is built once per (width, height).
+
+    :param width: The width of the boards.
+    :type width: int
+    :param height: The height of the boards.
+    :type height: int
+    :return: For each piece character, a list indexed by the cell of the piece's top left corner of
+        (cells that must be empty, (cell, new character) changes) pairs, one per move that stays on the board.
+    :rtype: dict[str, list[list[tuple[tuple[int, ...], tuple[tuple[int, str], ...]]]]]
+    """
+    table = {}
+    for ch, cells in PIECE_CELLS.items():
+        table[ch] = []
+        for start in range(width * height):
+            x, y = start % width, start // width
+            moves = []
+            for direction in MOVE_ORDER[ch]:
+                dx, dy = DIRECTIONS[direction]
+                before = {(x + cx) + (y + cy) * width: cell_ch for cx, cy, cell_ch in cells}
+                after = {}
+                for cx, cy, cell_ch in cells:
+                    nx, ny = x + cx + dx, y + cy + dy
+                    if not (0 <= nx < width and 0 <= ny < height):
+                        break
+                    after[nx + ny * width] = cell_ch
+                else:
+                    empty = tuple(cell for cell in after if cell not in before)
+                    changes = tuple((cell, '.') for cell in before if cell not in after) + tuple(after.items())
+                    moves.append((empty, changes))
+            table[ch].append(moves)
+    return table
+
+def neighbour_keys(key, height):
+    """
+    Returns the packed boards one move away from a packed board, in the same
+    order as slide_piece gives them for the pieces of the unpacked board.
+    Moves are reversible, so these are both its successors and its predecessors.
+
+    :param key: A packed board.
+    :type key: str
+    :param height: The height of the board.
+    :type height: int
+    :rtype: list[str]
+    """
+    width = len(key) // height
+    moves = move_table(width, height)
+    neighbours = []
+    covered = set() # Cells of 2x2 pieces found above or to the left
+    for start, ch in enumerate(key):
+        if ch == '1':
+            if start in covered:
+                continue
+            covered.update((start + 1, start + width, start + width + 1))
+        elif ch not in MOVE_ORDER:
+            continue
+        for empty, changes in moves[ch][start]:
+            if all(key[cell] == '.' for cell in empty):
+                cells = list(key)
+                for cell, new_ch in changes:
+                    cells[cell] = new_ch
+                neighbours.append(''.join(cells))
+    return neighbours
+
+def neighbour_records(record, height):
+    """
+    Returns neighbour_keys for a packed board encoded as ASCII, encoded the same way.
+
+    :param record: A packed board encoded as ASCII.
+    :type record: bytes
+    :param height: The height of the board.
+    :type height: int
+    :rtype: list[bytes]
+    """
+    return [key.encode("ascii") for key in neighbour_keys(record.decode("ascii"), height)]
+
+def external_search(board, goal_board, workdir=None, chunk_records=1000000, stats=None, budget=None):
+    """
+    Performs a breadth-first search that keeps its layers in sorted files on
+    disk instead of an explored set in memory (external-memory frontier search).
+
+    Each new layer is generated from the current one in chunks of
+    chunk_records boards that are sorted and written out as runs; the runs are
+    then merged, and duplicates are removed during the merge (delayed
+    duplicate detection) by also dropping every board of the current and
+    previous layers. Since every move can be undone, no other layer can hold a
+    neighbour of the current one. Only one chunk is ever held in memory, so
+    the search can solve, or prove unsolvable, puzzles with more reachable
+    boards than fit in memory. All layers are kept on disk until the end to
+    rebuild the solution path backwards from the goal. Being breadth first,
+    the solution found has the fewest possible moves.
+
+    :param board: The initial board.
+    :type board: Board
+    :param goal_board: The goal board.
+    :type goal_board: Board
+    :param workdir: The directory for the layer files; a temporary directory is used (and removed) if None.
+    :type workdir: Optional[str]
+    :param chunk_records: The number of boards sorted in memory at a time.
+    :type chunk_records: int
+    :param stats: Collects search statistics, if given (the frontier peak is the largest layer).
+    :type stats: Optional[SearchStats]
+    :param budget: Stops the search (returning None) once it runs out, if given.
+    :type budget: Optional[SearchBudget]
+    :return: A list of states representing the solution path if a solution is found; otherwise, None.
+    :rtype: list[State] or None
+    """
+    height = board.height
+    record_size = board.width * height
+    start = pack_board(board).encode("ascii")
+    goal = pack_board(goal_board).encode("ascii")
+    if start == goal:
+        return [State(board, heuristic, 0, 0, None), State(goal_board, heuristic, 0, 0, None)]
+    temporary = workdir is None
+    if temporary:
+        workdir = tempfile.mkdtemp(prefix="tile_puzzle_")
+    else:
+        os.makedirs(workdir, exist_ok=True)
+    layer_name = lambda depth: os.path.join(workdir, "layer_{}.bin".format(depth))
+    write_sorted_run([start], layer_name(0))
+    layers = [LayerFile(layer_name(0), record_size)]
+    runs = [] # The sorted runs of the layer being generated, removed once merged
+    try:
+        while True:
+            depth = len(layers) - 1
+            runs = []
+            chunk = []
+            for record in layers[depth]:
+                if budget is not None and budget.spend():
+                    return None
+                neighbours = neighbour_records(record, height)
+                if stats is not None:
+                    stats.expanded += 1
+                    stats.generated += len(neighbours)
+                chunk += neighbours
+                if len(chunk) >= chunk_records:
+                    runs.append(os.path.join(workdir, "run_{}.bin".format(len(runs))))
+                    write_sorted_run(chunk, runs[-1])
+                    chunk = []
+            runs.append(os.path.join(workdir, "run_{}.bin".format(len(runs))))
+            write_sorted_run(chunk, runs[-1])
+            chunk = []
+            # Merge the runs into the next layer, dropping duplicates and boards already seen
+            run_files = [LayerFile(run, record_size) for run in runs]
+            seen = layers[max(depth - 1, 0):]
+            seen_iterators = [iter(layer) for layer in seen]
+            seen_heads = [next(iterator, None) for iterator in seen_iterators]
+            found = False
+            with open(layer_name(depth + 1), "wb") as layer_file:
+                previous = None
+                for record in heapq.merge(*run_files):
+                    if record == previous:
+                        if stats is not None:
+                            stats.duplicates += 1
+                        continue
+                    previous = record
+                    duplicate = False
+                    for index, iterator in enumerate(seen_iterators):
+                        while seen_heads[index] is not None and seen_heads[index] < record:
+                            seen_heads[index] = next(iterator, None)
+                        duplicate = duplicate or seen_heads[index] == record
+                    if duplicate:
+                        if stats is not None:
+                            stats.duplicates += 1
+                        continue
+                    layer_file.write(record)
+                    found = found or record == goal
+            for run_file, run in zip(run_files, runs):
+                run_file.close()
+                os.remove(run)
+            layers.append(LayerFile(layer_name(depth + 1), record_size))
+            if stats is not None:
+                stats.frontier_peak = max(stats.frontier_peak, len(layers[-1]))
+            if found:
+                break
+            if not len(layers[-1]):
+                return None # Every reachable board has been seen without reaching the goal
+        # Walk back from the goal, at each layer picking a neighbour from the layer before
+        path = [goal]
+        for depth in range(len(layers) - 2, -1, -1):
+            path.append(next(record for record in neighbour_records(path[-1], height) if record in layers[depth]))
+        return boards_to_states([unpack_board(record.decode("ascii"), height) for record in reversed(path)])
+    finally:
+        for layer in layers:
+            layer.close()
+        if temporary:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            # A budget that runs out mid-layer leaves the runs written so far behind
+            for path in runs + [layer_name(depth) for depth in range(len(layers) + 1)]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+class SolutionCache:
+    """
+    A persistent SQLite cache of solved puzzles, keyed by the packed initial
+    and goal boards and the searching algorithm (with its weight), since the
+    engines other than external search may return different, longer paths.
+    Besides whole solutions it records, for every board on an optimal
+    solution, its exact number of moves to the goal and the next board on
+    the way, so any later search toward the same goal can stop as soon as it
+    reaches one of those boards.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: The SQLite database file, created if it does not exist.
+        :type filename: str
+        """
+        self.connection = sqlite3.connect(filename)
+        self.hits = 0 # Searches completed from cached goal distances
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS solutions (
+                initial TEXT NOT NULL, goal TEXT NOT NULL, algo TEXT NOT NULL, weight REAL NOT NULL,
+                height INTEGER NOT NULL, path TEXT,
+                PRIMARY KEY (initial, goal, algo, weight)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS distances (
+                goal TEXT NOT NULL, state TEXT NOT NULL, distance INTEGER NOT NULL, next TEXT,
+                PRIMARY KEY (goal, state)) WITHOUT ROWID;
+        """)
+
+    def lookup(self, board, goal_board, algo, weight=0):
+        """
+        Looks up the solution of a puzzle, either stored whole or made of the
+        cached distances from the initial board. A stored solution is used if
+        it came from the same algorithm and weight or from external search
+        (which is optimal), and a stored "no solution" from any algorithm.
+
+        :param board: The initial board.
+        :type board: Board
+        :param goal_board: The goal board.
+        :type goal_board: Board
+        :param algo: The searching algorithm, one of ALGOS.
+        :type algo: str
+        :param weight: The heuristic weight of 'wastar' (0 for the other algorithms).
+        :type weight: float
+        :return: Whether the puzzle is cached, and its solution (None if it has no solution).
+        :rtype: tuple[bool, list[State] or None]
+        """
+        initial, goal = pack_board(board), pack_board(goal_board)
+        row = self.connection.execute("""
+            SELECT path FROM solutions WHERE initial = ? AND goal = ?
+            AND ((algo = ? AND weight = ?) OR algo = 'external' OR path IS NULL)""",
+                                      (initial, goal, algo, weight)).fetchone()
+        if row is not None:
+            if row[0] is None:
+                return True, None
+            keys = row[0].split()
+            if len(keys) == 1:
+                keys *= 2 # Like the searches, answer [initial, goal] when the two boards are equal
+            return True, boards_to_states([unpack_board(key, board.height) for key in keys])
+        distance = self.distance(goal, initial)
+        if distance == 0:
+            return True, boards_to_states([board, goal_board])
+        if distance is not None:
+            return True, self.complete_solution(State(board, heuristic, 0, 0, None), goal)
+        return False, None
+
+    def distance(self, goal, key):
+        """
+        Returns the cached number of moves from a board to a goal board.
+
+        :param goal: The packed goal board.
+        :type goal: str
+        :param key: The packed board.
+        :type key: str
+        :rtype: int or None
+        """
+        row = self.connection.execute("SELECT distance FROM distances WHERE goal = ? AND state = ?",
+                                      (goal, key)).fetchone()
+        return None if row is None else row[0]
+
+    def complete_solution(self, state, goal):
+        """
+        Extends the path to a state with the cached path from its board to the goal.
+
+        :param state: A state whose board has a cached distance to the goal.
+        :type state: State
+        :param goal: The packed goal board.
+        :type goal: str
+        :return: The whole solution path.
+        :rtype: list[State]
+        """
+        boards = []
+        key = self.connection.execute("SELECT next FROM distances WHERE goal = ? AND state = ?",
+                                      (goal, pack_board(state.board))).fetchone()[0]
+        while key is not None:
+            boards.append(unpack_board(key, state.board.height))
+            key = self.connection.execute("SELECT next FROM distances WHERE goal = ? AND state = ?",
+                                          (goal, key)).fetchone()[0]
+        self.hits += 1
+        return get_solution(state) + boards_to_states(boards, state)
+
+    def store(self, board, goal_board, solution, algo, weight=0, optimal=False):
+        """
+        Stores the result of a completed search. Goal distances are only
+        recorded for optimal solutions, since only then is every board on the
+        path at its exact distance from the goal.
+
+        :param board: The initial board.
+        :type board: Board
+        :param goal_board: The goal board.
+        :type goal_board: Board
+        :param solution: The solution path, or None if there is no solution.
+        :type solution: list[State] or None
+        :param algo: The searching algorithm that found it, one of ALGOS.
+        :type algo: str
+        :param weight: The heuristic weight of 'wastar' (0 for the other algorithms).
+        :type weight: float
+        :param optimal: Whether the solution is sure to have the fewest possible moves.
+        :type optimal: bool
+        """
+        initial, goal = pack_board(board), pack_board(goal_board)
+        keys = None
+        if solution is not None:
+            keys = [pack_board(state.board) for state in solution]
+            if len(keys) > 1 and keys[-1] == keys[-2]:
+                keys.pop() # Searches return [initial, goal] when the two boards are equal
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)",
+                                    (initial, goal, algo, weight, board.height, None if keys is None else " ".join(keys)))
+            if keys is not None and optimal:
+                rows = [(goal, key, len(keys) - 1 - index, keys[index + 1] if index + 1 < len(keys) else None)
+                        for index, key in enumerate(keys)]
+                self.connection.executemany("""
+                    INSERT INTO distances VALUES (?, ?, ?, ?)
+                    ON CONFLICT (goal, state) DO UPDATE SET distance = excluded.distance, next = excluded.next
+                    WHERE excluded.distance < distances.distance""", rows)
+
+    def close(self):
+        self.connection.close()
+
+class DistanceTable:
+    """
+    The exact number of moves from every board that can reach a fixed goal
+    board, found by one breadth-first search out from the goal (moves are
+    reversible, so this is the backward search). Distances are kept in a flat
+    array indexed by the BoardRanker rank of each board with the goal's size
+    and inventory, which also serves as the visited set of the search, so no
+    per-board objects are kept. Any start board is then solved optimally by
+    repeatedly moving to a neighbour one move closer to the goal.
+    """
+
+    HEADER = "# tile sliding puzzle distance table v2"
+    UNREACHABLE = 0xFFFF # Distance of boards that can not reach the goal
+
+    def __init__(self, height, width, goal, distances):
+        """
+        :param height: The height of the board.
+        :type height: int
+        :param width: The width of the board.
+        :type width: int
+        :param goal: The packed goal board.
+        :type goal: str
+        :param distances: The distance of every board, indexed by rank.
+        :type distances: array
+        """
+        self.height = height
+        self.width = width
+        self.goal = goal
+        self.ranker = BoardRanker(width, height, piece_inventory(unpack_board(goal, height)))
+        self.distances = distances
+
+    @classmethod
+    def build(cls, goal_board, stats=None):
+        """
+        Runs the breadth-first search out from a goal board.
+
+        :param goal_board: The goal board.
+        :type goal_board: Board
+        :param stats: Collects search statistics, if given.
+        :type stats: Optional[SearchStats]
+        :rtype: DistanceTable
+        """
+        height = goal_board.height
+        goal = pack_board(goal_board)
+        table = cls(height, goal_board.width, goal, array("H"))
+        ranker = table.ranker
+        distances = array("H", [cls.UNREACHABLE]) * ranker.total
+        distances[ranker.rank(goal)] = 0
+        layer = [goal]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for key in layer:
+                neighbours = neighbour_keys(key, height)
+                if stats is not None:
+                    stats.expanded += 1
+                    stats.generated += len(neighbours)
+                for neighbour in neighbours:
+                    rank = ranker.rank(neighbour)
+                    if distances[rank] == cls.UNREACHABLE:
+                        distances[rank] = depth
+                        next_layer.append(neighbour)
+            if stats is not None:
+                stats.frontier_peak = max(stats.frontier_peak, len(next_layer))
+            layer = next_layer
+        table.distances = distances
+        return table
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Reads a table written by save.
 
-def read_from_file(filename): # Function implementation from starter code
+        :param filename: The table file.
+        :type filename: str
+        :rtype: DistanceTable
+        :raises ValueError: If the file is not a distance table, or holds more or fewer distances than its goal has
+            boards with the same pieces (e.g. a truncated file).
+        """
+        with open(filename, "rb") as table_file:
+            if table_file.readline().decode("ascii").rstrip("\n") != cls.HEADER:
+                raise ValueError("{} is not a distance table".format(filename))
+            try:
+                header = json.loads(table_file.readline())
+                table = cls(header["height"], header["width"], header["goal"], array("H"))
+                byteorder = header["byteorder"]
+            except (KeyError, TypeError) as error:
+                raise ValueError("{} has a malformed header: {}".format(filename, error))
+            payload = table_file.read()
+        if len(payload) != table.ranker.total * table.distances.itemsize:
+            raise ValueError("{} holds {} bytes of distances, expected {} for {} boards".format(
+                filename, len(payload), table.ranker.total * table.distances.itemsize, table.ranker.total))
+        table.distances.frombytes(payload)
+        if byteorder != sys.byteorder:
+            table.distances.byteswap()
+        return table
+
+    def save(self, filename):
+        """
+        Writes the table to a file.
+
+        :param filename: The table file.
+        :type filename: str
+        """
+        header = {"height": self.height, "width": self.width, "goal": self.goal, "byteorder": sys.byteorder}
+        with open(filename, "wb") as table_file:
+            table_file.write((self.HEADER + "\n" + json.dumps(header) + "\n").encode("ascii"))
+            table_file.write(self.distances.tobytes())
+
+    def distance(self, key):
+        """
+        Returns the number of moves from a board to the goal.
+
+        :param key: A packed board.
+        :type key: str
+        :return: The distance, or None if the board can not reach the goal.
+        :rtype: int or None
+        """
+        if len(key) != self.width * self.height:
+            return None
+        try:
+            distance = self.distances[self.ranker.rank(key)]
+        except ValueError:
+            return None # A different piece inventory
+        return None if distance == self.UNREACHABLE else distance
+
+    def solve(self, board):
+        """
+        Finds an optimal solution by stepping to a neighbour one move closer to
+        the goal until the goal is reached, which takes a number of lookups
+        proportional to the solution length.
+
+        :param board: The initial board.
+        :type board: Board
+        :return: A list of states representing the solution path if a solution exists; otherwise, None.
+        :rtype: list[State] or None
+        """
+        key = pack_board(board)
+        distance = self.distance(key)
+        if distance is None:
+            return None
+        keys = [key]
+        if distance == 0:
+            keys.append(key) # Like the searches, answer [initial, goal] when the two boards are equal
+        while distance > 0:
+            distance -= 1
+            keys.append(next(neighbour for neighbour in neighbour_keys(keys[-1], self.height)
+                             if self.distance(neighbour) == distance))
+        return boards_to_states([unpack_board(key, self.height) for key in keys])
+
+
+def read_from_file(filename): # Function implementation from starter code, rewritten to use the validating parser
     """
     Load initial board from a given file.
 
@@ -694,73 +1972,661 @@ def read_from_file(filename): # Function implementation from starter code
     :type filename: str
     :return: A loaded board
     :rtype: Board
+    :raises ValueError: If the file does not hold a well formed puzzle.
     """
 
-    puzzle_file = open(filename, "r")
+    with open(filename, "r") as puzzle_file:
+        puzzle = next(stream_puzzles(puzzle_file), None)
+    if puzzle is None:
+        raise ValueError("no puzzle found")
+    return puzzle
 
-    line_index = 0
+
+ALGOS = ['astar', 'wastar', 'greedy', 'dfs', 'external'] # The searching algorithms selectable with --algo
+DEFAULT_WEIGHT = 2 # The heuristic weight used by weighted A* unless --weight is given
+
+PUZZLE_SEPARATOR = '---' # Separates the solutions of consecutive puzzles in one output file
+NO_SOLUTION = 'No solution' # Written for a puzzle that provably has no solution
+BUDGET_EXHAUSTED = 'No solution found within budget' # Written when the budget ran out before any solution was found
+
+DIRECTIONS = {'up': (0, -1), 'down': (0, 1), 'left': (-1, 0), 'right': (1, 0)}
+
+BOARD_CHARS = '.12<>^v' # Every character allowed in a state
+
+def parse_board(rows, first_line=1):
+    """
+    Builds a board from the rows of characters of a single state, taking its
+    width from the first row and checking that every piece is complete: each 2x2 piece fills a full 2x2 block, each
+    '<' is followed by '>' and each '^' has a 'v' below it.
+
+    :param rows: The rows of the state, one string per row without the newline.
+    :type rows: List[str]
+    :param first_line: The line number of the first row, used in error messages.
+    :type first_line: int
+    :return: The board described by the rows.
+    :rtype: Board
+    :raises ValueError: If the rows do not describe a valid board, naming the line and column.
+    """
     pieces = []
-    final_pieces = []
-    final = False
-    found_2by2 = False
-    finalfound_2by2 = False
-    height_ = 0
-    count = 0
-    track = set()
-    final_count = 0
-    final_track = set()
-    for line in puzzle_file:
-        height_ += 1
-        if line == '\n':
-            if not final:
-                height_ = 0
-                final = True
-                line_index = 0
+    claimed = set()  # Cells already covered by a piece that starts above or to the left
+    width = len(rows[0]) if rows else 0 # Every row must be as wide as the first
+    if rows and width == 0:
+        raise ValueError("line {}: empty row".format(first_line))
+    for y, row in enumerate(rows):
+        if len(row) != width:
+            raise ValueError("line {}: expected {} characters per row like the first, got '{}'".format(
+                first_line + y, width, row))
+        for x, ch in enumerate(row):
+            where = "line {}, column {}".format(first_line + y, x + 1)
+            if ch not in BOARD_CHARS:
+                raise ValueError("{}: unknown character '{}'".format(where, ch))
+            if (x, y) in claimed:
+                claimed.remove((x, y))
+                continue
+            if ch == '1':
+                cells = [(x + 1, y), (x, y + 1), (x + 1, y + 1)]
+                if any(cx >= len(row) or cy >= len(rows) or rows[cy][cx] != '1' or (cx, cy) in claimed
+                       for cx, cy in cells):
+                    raise ValueError("{}: incomplete 2x2 piece".format(where))
+                claimed.update(cells)
+                pieces.append(Piece(True, False, x, y, None))
+            elif ch == '<':
+                if x + 1 >= len(row) or row[x + 1] != '>':
+                    raise ValueError("{}: '<' is not followed by '>'".format(where))
+                claimed.add((x + 1, y))
+                pieces.append(Piece(False, False, x, y, 'h'))
+            elif ch == '^':
+                if y + 1 >= len(rows) or x >= len(rows[y + 1]) or rows[y + 1][x] != 'v':
+                    raise ValueError("{}: '^' has no 'v' below it".format(where))
+                claimed.add((x, y + 1))
+                pieces.append(Piece(False, False, x, y, 'v'))
+            elif ch == char_single:
+                pieces.append(Piece(False, True, x, y, None))
+            elif ch != '.':
+                raise ValueError("{}: '{}' does not belong to any piece".format(where, ch))
+    return Board(len(rows), pieces, width)
+
+def pack_board(board):
+    """
+    Returns the compact encoding of a board: its grid read row by row as a
+    single string. Two boards have the same encoding exactly when they are
+    equal, so the encoding is used as the key of explored states.
+
+    :param board: A given board.
+    :type board: Board
+    :rtype: str
+    """
+    return ''.join([''.join(row) for row in board.grid])
+
+def unpack_board(packed, height):
+    """
+    Rebuilds a board from its compact encoding.
+
+    :param packed: A board encoded by pack_board.
+    :type packed: str
+    :param height: The height of the board.
+    :type height: int
+    :rtype: Board
+    """
+    width = len(packed) // height
+    return parse_board([packed[y * width:(y + 1) * width] for y in range(height)])
+
+def piece_inventory(board):
+    """
+    Returns the number of 2x2, 1x1, horizontal and vertical pieces and empty cells on a board.
+    Moves never change these counts, so boards with different inventories can not reach each other.
+
+    :param board: A given board.
+    :type board: Board
+    :rtype: tuple[int, int, int, int, int]
+    """
+    packed = pack_board(board)
+    return (packed.count('1') // 4, packed.count(char_single), packed.count('<'), packed.count('^'), packed.count('.'))
+
+def check_invariants(board, goal_board):
+    """
+    Cheaply checks properties that no sequence of moves can change, so that
+    puzzles that break one of them can be answered without any search.
+
+    - Both boards have the same size and the same piece inventory (including blanks).
+    - With no empty cell nothing can move, so the boards must already be equal.
+    - With a single empty cell a 2x2 piece can never move, a horizontal piece
+      can only slide along its row and a vertical piece along its column.
+
+    :param board: The initial board.
+    :type board: Board
+    :param goal_board: The goal board.
+    :type goal_board: Board
+    :return: False if the goal board is certainly unreachable; otherwise, True.
+    :rtype: bool
+    """
+    if board.height != goal_board.height or board.width != goal_board.width:
+        return False
+    inventory = piece_inventory(board)
+    if inventory != piece_inventory(goal_board):
+        return False
+    blanks = inventory[-1]
+    if blanks == 0:
+        return board == goal_board
+    if blanks == 1:
+        curr_pieces = piece_tracker(State(board, None, 0, 0))
+        goal_pieces = piece_tracker(State(goal_board, None, 0, 0))
+        invariants = [("two_by_two", lambda piece: (piece.coord_x, piece.coord_y)),
+                      ("h", lambda piece: piece.coord_y),
+                      ("v", lambda piece: piece.coord_x)]
+        for piece_type, invariant in invariants:
+            if sorted(map(invariant, curr_pieces[piece_type])) != sorted(map(invariant, goal_pieces[piece_type])):
+                return False
+    return True
+
+class BoardRanker:
+    """
+    Maps every board of a given size and piece inventory to a distinct
+    integer in range(total) (its rank) and back, so that per-board data such
+    as distances or visited flags can be kept in flat arrays indexed by rank.
+
+    Boards are enumerated by reading the cells in order and, at each cell not
+    already covered by an earlier piece, choosing what starts there: a blank,
+    a 1x1, a horizontal, a vertical or a 2x2 piece (in that order). The rank
+    of a board counts the boards that make an earlier choice at the first
+    cell where they differ. Counting the ways to finish a partly filled board
+    only depends on the cell reached, which of the next width + 2 cells are
+    already covered and how many of each piece are left, so those counts (and
+    the rank offset of each choice) are memoised and ranking or unranking
+    takes one step per cell.
+    """
+
+    # (character, cells covered relative to the top left corner, index into the remaining counts)
+    CHOICES = [('.', [], 0), (char_single, [], 1), ('<', [(1, 0)], 2), ('^', [(0, 1)], 3), ('1', [(1, 0), (0, 1), (1, 1)], 4)]
+    COVER = {'.': '.', char_single: char_single, '<': '>', '^': 'v', '1': '1'} # Character of the other covered cells
+
+    def __init__(self, width, height, inventory):
+        """
+        :param width: The width of the boards.
+        :type width: int
+        :param height: The height of the boards.
+        :type height: int
+        :param inventory: The piece inventory of the boards, as returned by piece_inventory.
+        :type inventory: tuple[int, int, int, int, int]
+        """
+        self.width = width
+        self.height = height
+        self.inventory = tuple(inventory)
+        two_by_two, single, horizontal, vertical, blank = inventory
+        self.start_counts = (blank, single, horizontal, vertical, two_by_two)
+        self.completions = functools.lru_cache(maxsize=None)(self._completions)
+        self.steps = functools.lru_cache(maxsize=None)(self._steps)
+        self.total = self.completions(0, 0, self.start_counts)
+
+    def _fits(self, cell, mask, covered):
+        """
+        Returns the mask of cells a piece would cover from cell, or None if it does not fit.
+        """
+        x, y = cell % self.width, cell // self.width
+        bits = 1
+        for dx, dy in covered:
+            if x + dx >= self.width or y + dy >= self.height:
+                return None
+            bit = 1 << (dx + dy * self.width)
+            if mask & bit:
+                return None
+            bits |= bit
+        return bits
+
+    def _choices(self, cell, mask, counts):
+        """
+        Yields (character, counts after the choice, mask after the choice) for
+        every piece that can start at a free cell.
+        """
+        for ch, covered, index in self.CHOICES:
+            if counts[index] == 0:
+                continue
+            bits = self._fits(cell, mask, covered)
+            if bits is None:
+                continue
+            remaining = counts[:index] + (counts[index] - 1,) + counts[index + 1:]
+            yield ch, remaining, mask | bits
+
+    def _completions(self, cell, mask, counts):
+        """
+        Returns the number of ways to fill the board from cell onwards.
+        """
+        if cell == self.width * self.height:
+            return 1 if not any(counts) else 0
+        if mask & 1:
+            return self.completions(cell + 1, mask >> 1, counts)
+        return sum(self.completions(cell + 1, new_mask >> 1, remaining)
+                   for _, remaining, new_mask in self._choices(cell, mask, counts))
+
+    def _steps(self, cell, mask, counts):
+        """
+        Returns, for every piece that can start at a free cell, the rank
+        offset of choosing it together with the counts and mask after it.
+        """
+        steps = {}
+        offset = 0
+        for ch, remaining, new_mask in self._choices(cell, mask, counts):
+            steps[ch] = (offset, remaining, new_mask)
+            offset += self.completions(cell + 1, new_mask >> 1, remaining)
+        return steps
+
+    def rank(self, packed):
+        """
+        Returns the rank of a board.
+
+        :param packed: A board encoded by pack_board, with this ranker's size and inventory.
+        :type packed: str
+        :rtype: int
+        """
+        rank = 0
+        mask = 0
+        counts = self.start_counts
+        for cell in range(self.width * self.height):
+            if not mask & 1:
+                step = self.steps(cell, mask, counts).get(packed[cell])
+                if step is None:
+                    raise ValueError("board does not match the ranker's size and inventory")
+                offset, counts, mask = step
+                rank += offset
+            mask >>= 1
+        return rank
+
+    def unrank(self, rank):
+        """
+        Returns the board with the given rank.
+
+        :param rank: An integer in range(self.total).
+        :type rank: int
+        :return: The board encoded by pack_board.
+        :rtype: str
+        """
+        if not 0 <= rank < self.total:
+            raise ValueError("rank {} is out of range".format(rank))
+        cells = [None] * (self.width * self.height)
+        mask = 0
+        counts = self.start_counts
+        for cell in range(self.width * self.height):
+            if not mask & 1:
+                for ch, remaining, new_mask in self._choices(cell, mask, counts):
+                    completions = self.completions(cell + 1, new_mask >> 1, remaining)
+                    if rank < completions:
+                        cells[cell] = ch
+                        for covered_ch, covered, _ in self.CHOICES:
+                            if covered_ch == ch:
+                                for dx, dy in covered:
+                                    cells[cell + dx + dy * self.width] = self.COVER[ch]
+                        counts, mask = remaining, new_mask
+                        break
+                    rank -= completions
+            mask >>= 1
+        return "".join(cells)
+
+
+def find_piece(board, coord_x, coord_y):
+    """
+    Returns the piece whose top left corner is at the given coordinates.
+
+    :param board: A given board.
+    :type board: Board
+    :param coord_x: The x coordinate of the top left corner of the piece.
+    :type coord_x: int
+    :param coord_y: The y coordinate of the top left corner of the piece.
+    :type coord_y: int
+    :return: The piece at the given coordinates, or None if no piece starts there.
+    :rtype: Piece or None
+    """
+    for piece in board.pieces:
+        if piece.coord_x == coord_x and piece.coord_y == coord_y:
+            return piece
+    return None
+
+def apply_move(board, coord_x, coord_y, direction):
+    """
+    Slides the piece at the given coordinates one cell in the given direction.
+    The move is checked with the same rules used by the check_*_move functions,
+    so only moves the solver itself could have made are accepted.
+
+    :param board: A given board.
+    :type board: Board
+    :param coord_x: The x coordinate of the top left corner of the piece to move.
+    :type coord_x: int
+    :param coord_y: The y coordinate of the top left corner of the piece to move.
+    :type coord_y: int
+    :param direction: One of 'up', 'down', 'left' or 'right'.
+    :type direction: str
+    :return: The board after the move.
+    :rtype: Board
+    :raises ValueError: If there is no piece at the coordinates or the move is illegal.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError("unknown direction '{}'".format(direction))
+    piece = find_piece(board, coord_x, coord_y)
+    if piece is None:
+        raise ValueError("no piece at ({}, {})".format(coord_x, coord_y))
+    index = board.pieces.index(piece)
+    dx, dy = DIRECTIONS[direction]
+    # Successor boards keep the pieces in the same order, so the moved piece keeps its index
+    for new_board in slide_piece(board, piece):
+        moved = new_board.pieces[index]
+        if moved.coord_x == coord_x + dx and moved.coord_y == coord_y + dy:
+            return new_board
+    raise ValueError("illegal move: ({}, {}) {}".format(coord_x, coord_y, direction))
+
+def solution_to_moves(solution):
+    """
+    Converts a solution path into the sequence of moves that produces it.
+
+    :param solution: A list of states from the initial state to the goal state.
+    :type solution: list[State]
+    :return: A list of (x, y, direction) moves, one for each step of the path.
+    :rtype: list[tuple]
+    """
+    moves = []
+    for prev_state, next_state in zip(solution, solution[1:]):
+        # Pieces are compared by position rather than list order, as boards rebuilt from
+        # their packed encoding list pieces in reading order
+        prev_pieces = {(piece.is_2_by_2, piece.is_single, piece.orientation, piece.coord_x, piece.coord_y)
+                       for piece in prev_state.board.pieces}
+        next_pieces = {(piece.is_2_by_2, piece.is_single, piece.orientation, piece.coord_x, piece.coord_y)
+                       for piece in next_state.board.pieces}
+        moved_from = prev_pieces - next_pieces
+        moved_to = next_pieces - prev_pieces
+        if not moved_from:
+            continue  # The initial state was already the goal state
+        (*_, prev_x, prev_y), = moved_from
+        (*_, next_x, next_y), = moved_to
+        for direction, delta in DIRECTIONS.items():
+            if delta == (next_x - prev_x, next_y - prev_y):
+                moves.append((prev_x, prev_y, direction))
+    return moves
+
+def write_moves(solution):
+    """
+    Prints a solution in the compact move list format: the initial state,
+    an empty line, then one "x y direction" line for each move.
+
+    :param solution: A list of states from the initial state to the goal state.
+    :type solution: list[State]
+    """
+    solution[0].board.display()
+    print("")
+    for coord_x, coord_y, direction in solution_to_moves(solution):
+        print(coord_x, coord_y, direction)
+
+def read_moves_from_file(filename):
+    """
+    Load an initial board and a move list written by write_moves.
+
+    :param filename: The name of the given file.
+    :type filename: str
+    :return: The initial board and the list of (x, y, direction) moves.
+    :rtype: tuple[Board, list[tuple]]
+    :raises ValueError: If the file does not start with a well formed move list.
+    """
+    with open(filename, "r") as moves_file:
+        move_list = next(stream_move_lists(moves_file))
+    if isinstance(move_list, str):
+        raise ValueError("the file holds no solution ('{}')".format(move_list))
+    return move_list
+
+def stream_move_lists(moves_file):
+    """
+    Lazily reads the move lists of a file written with --outputformat moves,
+    one per puzzle, separated by PUZZLE_SEPARATOR lines.
+
+    :param moves_file: An open file (or any iterable of lines), e.g. sys.stdin.
+    :type moves_file: Iterable[str]
+    :return: A generator of (initial board, list of (x, y, direction) moves) pairs,
+        with the marker line (NO_SOLUTION or BUDGET_EXHAUSTED) for a puzzle without a solution.
+    :rtype: Iterator[Union[tuple[Board, list[tuple]], str]]
+    :raises ValueError: If a move list is malformed, naming the line.
+    """
+    lines = []
+    first_line = 1
+    for line_number, line in enumerate(moves_file, 1):
+        line = line.rstrip('\r\n')
+        if line == PUZZLE_SEPARATOR:
+            yield parse_move_list(lines, first_line)
+            lines = []
+            first_line = line_number + 1
             continue
-        if not final: #initial board
-            for x, ch in enumerate(line):
-                if ch != '\n':
-                    count += 1
-                if ch == '^': # found vertical piece
-                    pieces.append(Piece(False, False, x, line_index, 'v'))
-                elif ch == '<': # found horizontal piece
-                    pieces.append(Piece(False, False, x, line_index, 'h'))
-                elif ch == char_single:
-                    pieces.append(Piece(False, True, x, line_index, None))
-                # Modified error in starter code to track every 2x2 piece on the board
-                elif ch == '1' and count not in track:
-                    track.add(count+1)
-                    track.add(count+4)
-                    track.add(count+5)
-                    pieces.append(Piece(True, False, x, line_index, None))
-                if count in track:
-                    track.remove(count)
-
-                    
-        else: #goal board
-            for x, ch in enumerate(line):
-                if ch != '\n':
-                    final_count += 1
-                if ch == '^': # found vertical piece
-                    final_pieces.append(Piece(False, False, x, line_index, 'v'))
-                elif ch == '<': # found horizontal piece
-                    final_pieces.append(Piece(False, False, x, line_index, 'h'))
-                elif ch == char_single:
-                    final_pieces.append(Piece(False, True, x, line_index, None))
-                # Modified error in starter code to track every 2x2 piece on the board
-                elif ch == '1' and final_count not in final_track:
-                    final_track.add(final_count+1)
-                    final_track.add(final_count+4)
-                    final_track.add(final_count+5)
-                    final_pieces.append(Piece(True, False, x, line_index, None))
-                if final_count in final_track:
-                    final_track.remove(final_count)
-        line_index += 1
-        
-    puzzle_file.close()
-    board = Board(height_, pieces)
-    goal_board = Board(height_, final_pieces)
-    return board, goal_board
+        lines.append(line)
+    yield parse_move_list(lines, first_line)
+
+def parse_move_list(lines, first_line=1):
+    """
+    Parses one move list written by write_moves (or the marker line write_solution writes instead).
+
+    :param lines: The lines of the move list without newlines.
+    :type lines: list[str]
+    :param first_line: The line number of the first line, used in error messages.
+    :type first_line: int
+    :return: The initial board and the list of (x, y, direction) moves, or the marker line if there is no solution.
+    :rtype: Union[tuple[Board, list[tuple]], str]
+    :raises ValueError: If the lines are not a well formed move list.
+    """
+    start = 0
+    while start < len(lines) and lines[start].strip() == '':
+        start += 1
+    if start == len(lines):
+        raise ValueError("line {}: expected an initial board".format(first_line))
+    if lines[start].strip() in (NO_SOLUTION, BUDGET_EXHAUSTED):
+        return lines[start].strip()
+    end = start
+    while end < len(lines) and lines[end].strip() != '':
+        end += 1
+    board = parse_board(lines[start:end], first_line + start)
+    moves = []
+    for index in range(end, len(lines)):
+        fields = lines[index].split()
+        if not fields:
+            continue
+        if len(fields) != 3 or not fields[0].isdigit() or not fields[1].isdigit():
+            raise ValueError("line {}: malformed move line: '{}'".format(first_line + index, lines[index]))
+        moves.append((int(fields[0]), int(fields[1]), fields[2]))
+    return board, moves
+
+def replay_moves(board, moves):
+    """
+    Expands a move list into the full list of boards of the solution path,
+    validating every move along the way.
+
+    :param board: The initial board.
+    :type board: Board
+    :param moves: A list of (x, y, direction) moves.
+    :type moves: list[tuple]
+    :return: A list of boards starting with the initial board (the initial board twice if there are no moves).
+    :rtype: list[Board]
+    :raises ValueError: If any move is illegal, naming the offending step.
+    """
+    boards = [board]
+    for step, (coord_x, coord_y, direction) in enumerate(moves, 1):
+        try:
+            board = apply_move(board, coord_x, coord_y, direction)
+        except ValueError as error:
+            raise ValueError("move {}: {}".format(step, error))
+        boards.append(board)
+    if not moves:
+        boards.append(board) # Like the searches, answer [initial, goal] when the two boards are equal
+    return boards
+
+def validate_moves(board, moves, goal_board=None):
+    """
+    Checks that every move is legal and, if given, that the moves end at the goal board.
+
+    :param board: The initial board.
+    :type board: Board
+    :param moves: A list of (x, y, direction) moves.
+    :type moves: list[tuple]
+    :param goal_board: The board the moves should end at.
+    :type goal_board: Optional[Board]
+    :return: True if the move list is valid; otherwise, False.
+    :rtype: bool
+    """
+    try:
+        boards = replay_moves(board, moves)
+    except ValueError:
+        return False
+    return goal_board is None or boards[-1] == goal_board
+
+
+def read_blocks(puzzle_file):
+    """
+    Lazily splits a file into blocks of rows separated by empty lines.
+
+    :param puzzle_file: An open file (or any iterable of lines).
+    :type puzzle_file: Iterable[str]
+    :return: A generator of (first line number, rows) pairs, one per block.
+    :rtype: Iterator[tuple[int, list[str]]]
+    """
+    rows = []
+    first_line = 1
+    for line_number, line in enumerate(puzzle_file, 1):
+        line = line.rstrip('\r\n')
+        if line.strip() == '':
+            if rows:
+                yield first_line, rows
+                rows = []
+            continue
+        if not rows:
+            first_line = line_number
+        rows.append(line)
+    if rows:
+        yield first_line, rows
+
+def stream_puzzles(puzzle_file):
+    """
+    Lazily reads any number of (initial, goal) board pairs from a file.
+    Each state is a block of rows and consecutive blocks form a puzzle, so a
+    file holding a single puzzle reads the same as with read_from_file.
+    Boards are built and checked one puzzle at a time, which lets the caller
+    solve and write each puzzle before the next one is read.
+
+    :param puzzle_file: An open file (or any iterable of lines), e.g. sys.stdin.
+    :type puzzle_file: Iterable[str]
+    :return: A generator of (initial board, goal board) pairs.
+    :rtype: Iterator[tuple[Board, Board]]
+    :raises ValueError: If a board is malformed, a puzzle is missing its goal board or the two boards do not match in size.
+    """
+    blocks = read_blocks(puzzle_file)
+    for first_line, rows in blocks:
+        goal = next(blocks, None)
+        if goal is None:
+            raise ValueError("line {}: initial board has no goal board".format(first_line))
+        goal_line, goal_rows = goal
+        board = parse_board(rows, first_line)
+        goal_board = parse_board(goal_rows, goal_line)
+        if len(rows) != len(goal_rows):
+            raise ValueError("line {}: goal board has {} rows but the initial board has {}".format(
+                goal_line, len(goal_rows), len(rows)))
+        if board.width != goal_board.width:
+            raise ValueError("line {}: goal board is {} columns wide but the initial board is {}".format(
+                goal_line, goal_board.width, board.width))
+        yield board, goal_board
+
+def solve_puzzle(board, goal_board, algo, invariants=True, stats=None, budget=None, weight=DEFAULT_WEIGHT,
+                 checkpoint=None, workdir=None, cache=None):
+    """
+    Solves a single puzzle with the given searching algorithm.
+
+    :param board: The initial board.
+    :type board: Board
+    :param goal_board: The goal board.
+    :type goal_board: Board
+    :param algo: The searching algorithm, one of ALGOS.
+    :type algo: str
+    :param invariants: Whether to rule out unsolvable puzzles with check_invariants before searching.
+    :type invariants: bool
+    :param stats: Collects search statistics and phase timings, if given.
+    :type stats: Optional[SearchStats]
+    :param budget: Limits the search, if given. A* then runs as anytime_search and returns the
+        best solution found within the budget; the other algorithms return None if the budget runs out.
+    :type budget: Optional[SearchBudget]
+    :param weight: The heuristic weight used by 'wastar'.
+    :type weight: float
+    :param checkpoint: Saves (and resumes) the search, if given. Used by 'astar' without a budget,
+        'wastar' and 'greedy'.
+    :type checkpoint: Optional[Checkpoint]
+    :param workdir: The directory for the layer files of 'external', a temporary one if None.
+    :type workdir: Optional[str]
+    :param cache: Answers cached puzzles, shortens searches toward cached goals and stores new results, if given.
+    :type cache: Optional[SolutionCache]
+    :return: A list of states representing the solution path if a solution is found; otherwise, None.
+    :rtype: list[State] or None
+    """
+    # Puzzles that break an invariant can never be solved, so there is nothing to search
+    if invariants:
+        with stats_phase(stats, "invariants"):
+            solvable = check_invariants(board, goal_board)
+        if not solvable:
+            return None
+    with stats_phase(stats, "search"):
+        cache_weight = weight if algo == "wastar" else 0 # Only weighted A* results depend on the weight
+        cached, solution = (False, None) if cache is None else cache.lookup(board, goal_board, algo, cache_weight)
+        if cached:
+            if stats is not None:
+                stats.cache_hit = "solution"
+        else:
+            hits = cache.hits if cache is not None else 0
+            solution = search_puzzle(board, goal_board, algo, stats, budget, weight, checkpoint, workdir, cache)
+            if stats is not None and cache is not None and cache.hits > hits:
+                stats.cache_hit = "distance"
+            if cache is not None and (budget is None or not budget.exhausted):
+                # Only the breadth-first external search is sure to be optimal: the heuristic can
+                # overestimate, so even A* without a budget may return a longer path
+                cache.store(board, goal_board, solution, algo, cache_weight, optimal=algo == "external")
+        if stats is not None and budget is not None:
+            stats.budget_exhausted = budget.exhausted
+    if stats is not None and solution is not None:
+        stats.solution_length = len(solution) - 1
+    return solution
+
+def search_puzzle(board, goal_board, algo, stats, budget, weight, checkpoint, workdir, cache):
+    """
+    Runs the searching algorithm for solve_puzzle; see there for the parameters.
+
+    :return: A list of states representing the solution path if a solution is found; otherwise, None.
+    :rtype: list[State] or None
+    """
+    if algo == "external":
+        return external_search(board, goal_board, workdir, stats=stats, budget=budget)
+    initial_state = State(board, heuristic, 0, 0, None)
+    goal_state = State(goal_board, heuristic, 0, 0, None)
+    initial_state.f = heuristic(initial_state, goal_state, stats) + initial_state.depth
+    if algo == "dfs":
+        solution = dfs_search(initial_state, goal_state, stats, budget, cache)
+    elif algo == "wastar":
+        solution = a_star_search(initial_state, goal_state, stats, budget, weight, checkpoint=checkpoint, cache=cache)
+    elif algo == "greedy":
+        solution = a_star_search(initial_state, goal_state, stats, budget, greedy=True, checkpoint=checkpoint,
+                                 cache=cache)
+    elif budget is not None:
+        solution = anytime_search(initial_state, goal_state, budget, stats)
+    else:
+        solution = a_star_search(initial_state, goal_state, stats, checkpoint=checkpoint, cache=cache)
+    return solution
+
+def write_solution(solution, outputformat='boards', exhausted=False):
+    """
+    Prints a solution in the requested output format, or a marker line if
+    there is none: NO_SOLUTION, or BUDGET_EXHAUSTED when the search was cut
+    short by its budget and the puzzle may still be solvable.
+
+    :param solution: A list of states from the initial state to the goal state, or None.
+    :type solution: list[State] or None
+    :param outputformat: 'boards' to print every board or 'moves' for the compact move list.
+    :type outputformat: str
+    :param exhausted: Whether the budget of the search ran out.
+    :type exhausted: bool
+    """
+    if solution is None:
+        print(BUDGET_EXHAUSTED if exhausted else NO_SOLUTION)
+    elif outputformat == 'moves':
+        write_moves(solution)
+    else:
+        for state in solution:
+            state.board.display()
+            print("")
 
 
 def grid_to_string(grid): # Function implementation from starter code (used for debugging)
@@ -779,41 +2645,227 @@ if __name__ == "__main__": # Implementation from starter code with minor changes
         "--inputfile",
         type=str,
         required=True,
-        help="The input file that contains the puzzles."
+        help="The input file that contains the puzzles ('-' for stdin)."
     )
     parser.add_argument(
         "--outputfile",
         type=str,
         required=True,
-        help="The output file that contains the solution."
+        help="The output file that contains the solution ('-' for stdout)."
     )
     parser.add_argument(
         "--algo",
         type=str,
-        required=True,
-        choices=['astar', 'dfs'],
-        help="The searching algorithm."
+        choices=ALGOS,
+        help="The searching algorithm: A*, weighted A*, greedy best-first search, DFS, or breadth-first "
+             "search with its layers kept on disk (external)."
+    )
+    parser.add_argument(
+        "--weight",
+        type=float,
+        default=DEFAULT_WEIGHT,
+        help="The heuristic weight for weighted A* (--algo wastar), f = depth + weight * heuristic."
+    )
+    parser.add_argument(
+        "--outputformat",
+        type=str,
+        default='boards',
+        choices=['boards', 'moves'],
+        help="Write every board of the solution, or the initial board followed by the list of moves."
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        help="Seconds each puzzle may be searched for. A* then returns the best solution found in time."
+    )
+    parser.add_argument(
+        "--max-nodes",
+        type=int,
+        help="The number of states each puzzle's search may expand."
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=float,
+        help="The memory, in megabytes, the solver may hold while searching."
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="Periodically save the A* frontier and explored set to <CHECKPOINT>.<puzzle hash> (also on SIGTERM)."
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=int,
+        default=10000,
+        help="The number of expanded states between two checkpoints."
+    )
+    parser.add_argument(
+        "--resume",
+        action='store_true',
+        help="Continue the search saved in the --checkpoint file, if it holds the same puzzle."
+    )
+    parser.add_argument(
+        "--workdir",
+        type=str,
+        help="The directory for the on-disk layers of --algo external (a temporary directory by default)."
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        help="A SQLite file of solved puzzles and goal distances to reuse and extend."
+    )
+    parser.add_argument(
+        "--distance-table",
+        type=str,
+        help="A table of the distances of all boards to one goal, built from the first puzzle's goal if "
+             "the file does not exist. Puzzles with that goal are answered from the table; others use --algo."
+    )
+    parser.add_argument(
+        "--no-invariants",
+        action='store_true',
+        help="Always run the search, even when a quick invariant check shows the puzzle has no solution."
+    )
+    parser.add_argument(
+        "--stats",
+        type=str,
+        help="Write search statistics and phase timings for every puzzle as JSON to this file ('-' for stderr)."
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Profile the searches and write <PROFILE>.pstats and <PROFILE>.txt (top functions and allocations "
+             "per expanded state), or <PROFILE>.collapsed (stack samples for flame graphs) with --profile-mode sample."
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=['cprofile', 'sample'],
+        default='cprofile',
+        help="Profile with cProfile (exact call counts, slower) or by sampling stacks (Unix only)."
+    )
+    parser.add_argument(
+        "--profile-interval",
+        type=float,
+        default=0.001,
+        help="Seconds of CPU time between two stack samples taken by --profile-mode sample."
+    )
+    parser.add_argument(
+        "--replay",
+        action='store_true',
+        help="Treat the input file as a move list and write out every board of the solution."
     )
     args = parser.parse_args()
 
-    # read the board from the file
-    board, goal_board = read_from_file(args.inputfile)
-    
-    # write solutions to the output file using the algorithm inputted by the user (DFS or A*)
-    if args.algo == "dfs":
-        initial_state = State(board, heuristic, 0, 0, None)
-        goal_state = State(goal_board, heuristic, 0, 0, None)
-        initial_state.f = heuristic(initial_state, goal_state) + initial_state.depth
-        solution = dfs_search(initial_state, goal_state)
-    else:
-        initial_state = State(board, heuristic, 0, 0, None)
-        goal_state = State(goal_board, heuristic, 0, 0, None)
-        initial_state.f = heuristic(initial_state, goal_state) + initial_state.depth
-        solution = a_star_search(initial_state, goal_state)
-    with open(args.outputfile, 'w') as sys.stdout:
-        if solution is None:
-            print("No solution")
+    if args.replay:
+        # expand a move list back into the full board output format
+        moves_file = sys.stdin if args.inputfile == '-' else open(args.inputfile, "r")
+        output_file = sys.stdout if args.outputfile == '-' else open(args.outputfile, 'w')
+        with moves_file, output_file as sys.stdout:
+            try:
+                for index, move_list in enumerate(stream_move_lists(moves_file)):
+                    if index > 0:
+                        print(PUZZLE_SEPARATOR)
+                    if isinstance(move_list, str):
+                        print(move_list)
+                        continue
+                    try:
+                        boards = replay_moves(*move_list)
+                    except ValueError as error:
+                        raise ValueError("puzzle {}: {}".format(index + 1, error))
+                    for board in boards:
+                        board.display()
+                        print("")
+            except ValueError as error:
+                parser.error("{}: {}".format(args.inputfile, error))
+        sys.exit(0)
+    if args.algo is None and args.distance_table is None:
+        parser.error("the following arguments are required: --algo")
+    if args.profile and args.profile_mode == 'sample' and not StackSampler.available:
+        parser.error("--profile-mode sample needs SIGPROF, which this platform does not have")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint")
+    if args.checkpoint and args.algo in ('dfs', 'external'):
+        parser.error("--checkpoint only works with --algo astar, wastar or greedy")
+    if args.checkpoint and args.algo == 'astar' and (
+            args.time_limit is not None or args.max_nodes is not None or args.max_memory is not None):
+        parser.error("--checkpoint does not work with A* under a budget, which runs as anytime search")
+    cache = SolutionCache(args.cache) if args.cache else None
+    table = None
+    if args.distance_table and os.path.exists(args.distance_table):
+        try:
+            table = DistanceTable.load(args.distance_table)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = Checkpoint(args.checkpoint, args.checkpoint_interval, args.resume)
+
+    # read the puzzles one at a time and write each solution to the output file as soon as it
+    # is found, using the algorithm inputted by the user (DFS or A*)
+    puzzle_file = sys.stdin if args.inputfile == '-' else open(args.inputfile, "r")
+    output_file = sys.stdout if args.outputfile == '-' else open(args.outputfile, 'w')
+    puzzle_stats = []
+    profiler = SearchProfiler(args.profile_interval, args.profile_mode == 'sample') if args.profile else None
+    profiled_expanded = 0 # States expanded by the profiled searches
+    with puzzle_file, output_file as sys.stdout:
+        try:
+            puzzles = stream_puzzles(puzzle_file)
+            for index in itertools.count():
+                has_budget = args.time_limit is not None or args.max_nodes is not None or args.max_memory is not None
+                stats = SearchStats() if args.stats or args.profile or has_budget else None
+                with stats_phase(stats, "parse"):
+                    puzzle = next(puzzles, None)
+                if puzzle is None:
+                    break
+                if index > 0:
+                    print(PUZZLE_SEPARATOR)
+                board, goal_board = puzzle
+                budget = None
+                if has_budget:
+                    budget = SearchBudget(args.time_limit, args.max_nodes, args.max_memory)
+                if args.distance_table and table is None:
+                    with stats_phase(stats, "build"):
+                        table = DistanceTable.build(goal_board, stats)
+                    table.save(args.distance_table)
+                with nullcontext() if profiler is None else profiler.running():
+                    if table is not None and table.height == goal_board.height and table.goal == pack_board(goal_board):
+                        with stats_phase(stats, "search"):
+                            solution = table.solve(board)
+                        if stats is not None and solution is not None:
+                            stats.solution_length = len(solution) - 1
+                    elif args.algo is None:
+                        raise ValueError("puzzle {} does not have the goal of the distance table; "
+                                         "use --algo to search for it".format(index + 1))
+                    else:
+                        solution = solve_puzzle(board, goal_board, args.algo, not args.no_invariants, stats, budget,
+                                                args.weight, checkpoint, args.workdir, cache)
+                if profiler is not None:
+                    profiled_expanded += stats.expanded
+                if budget is not None and budget.exhausted:
+                    if solution is None:
+                        found = "no solution found"
+                    elif stats.suboptimality_bound is None:
+                        found = "best solution has {} moves".format(len(solution) - 1)
+                    else:
+                        found = "best solution has {} moves, at most {:.3f} times the optimal".format(
+                            len(solution) - 1, stats.suboptimality_bound)
+                    print("Puzzle {}: budget exhausted, {}".format(index + 1, found), file=sys.stderr)
+                with stats_phase(stats, "write"):
+                    write_solution(solution, args.outputformat, budget is not None and budget.exhausted)
+                    sys.stdout.flush()
+                if args.stats:
+                    puzzle_stats.append(stats.as_dict())
+        except ValueError as error:
+            parser.error("{}: {}".format(args.inputfile, error))
+    if cache is not None:
+        cache.close()
+    if profiler is not None:
+        profiler.write(args.profile, profiled_expanded)
+
+    if args.stats:
+        report = {"puzzles": puzzle_stats, "peak_rss_kb": peak_rss_kb()}
+        if args.stats == '-':
+            json.dump(report, sys.stderr, indent=2)
+            sys.stderr.write("\n")
         else:
-            for state in solution:
-                state.board.display()
-                print("")
+            with open(args.stats, 'w') as stats_file:
+                json.dump(report, stats_file, indent=2)